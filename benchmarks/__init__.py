@@ -0,0 +1,5 @@
+"""
+Benchmarks package for the ISMS application.
+
+This package contains standalone performance benchmarks.
+"""
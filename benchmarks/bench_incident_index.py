@@ -0,0 +1,59 @@
+"""
+Benchmark for similar-incident retrieval.
+
+This script builds an incident index over synthetic descriptions drawn from
+a Zipf-like vocabulary, so some terms appear in a large share of incidents,
+and reports top-k query latency for queries made of common and rare terms.
+
+Run with:
+    python -m benchmarks.bench_incident_index [incident_count]
+"""
+
+import itertools
+import random
+import statistics
+import sys
+import time
+
+from services.incident_index import IncidentIndex
+
+INCIDENTS = 1_000_000
+VOCABULARY = 20_000
+WORDS_PER_INCIDENT = 15
+QUERIES = 50
+TOP_K = 5
+
+
+def main():
+    """Run the benchmark and print the results."""
+    incident_count = int(sys.argv[1]) if len(sys.argv) > 1 else INCIDENTS
+    rng = random.Random(7)
+    vocabulary = [f"term{number}" for number in range(VOCABULARY)]
+    cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(VOCABULARY)))
+
+    index = IncidentIndex()
+    started = time.perf_counter()
+    for incident_id in range(incident_count):
+        index.add(incident_id, " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=WORDS_PER_INCIDENT)))
+    build_seconds = time.perf_counter() - started
+
+    query_sets = {
+        "common terms": vocabulary[:10],
+        "mixed terms": vocabulary[:200],
+        "rare terms": vocabulary[5000:],
+    }
+    print(f"Incidents:  {incident_count:,} (built in {build_seconds:.1f} s)")
+    for label, pool in query_sets.items():
+        latencies = []
+        for _ in range(QUERIES):
+            query = " ".join(rng.sample(pool, 4))
+            started = time.perf_counter()
+            index.search(query, k=TOP_K)
+            latencies.append((time.perf_counter() - started) * 1000)
+        latencies.sort()
+        print(f"{label:12s} p50 {statistics.median(latencies):7.2f} ms, "
+              f"p99 {latencies[int(len(latencies) * 0.99) - 1]:7.2f} ms, max {latencies[-1]:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark for policy version history storage.
+
+This script records a long history of small edits to a large policy and
+reports the storage used by delta-compressed revisions compared with full
+copies, along with the latency of reconstructing revisions.
+
+Run with:
+    python -m benchmarks.bench_policy_history
+"""
+
+import random
+import statistics
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from models import Base, Policy
+from services import policy_history
+
+SECTIONS = 400
+REVISIONS = 200
+
+
+def _build_policy(rng: random.Random) -> str:
+    """Generate a long policy document."""
+    words = ["access", "control", "data", "user", "system", "review", "approval", "encryption",
+             "incident", "report", "asset", "owner", "audit", "retention", "backup", "network"]
+    lines = []
+    for section in range(1, SECTIONS + 1):
+        lines.append(f"{section}. " + " ".join(rng.choices(words, k=25)).capitalize() + ".\n")
+    return "".join(lines)
+
+
+def _edit(content: str, rng: random.Random) -> str:
+    """Change a few lines of a policy, and sometimes add one."""
+    lines = content.splitlines(keepends=True)
+    for _ in range(rng.randint(1, 3)):
+        index = rng.randrange(len(lines))
+        lines[index] = lines[index].rstrip(".\n") + " where applicable.\n"
+    if rng.random() < 0.3:
+        lines.insert(rng.randrange(len(lines)), "Additional requirement: review annually.\n")
+    return "".join(lines)
+
+
+def main():
+    """Run the benchmark and print the results."""
+    rng = random.Random(42)
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    content = _build_policy(rng)
+    db.add(Policy(policy_id=1, policy_title="Benchmark Policy", policy_content=content, version="1"))
+    db.commit()
+
+    full_bytes = 0
+    started = time.perf_counter()
+    for number in range(1, REVISIONS + 1):
+        policy_history.record_revision(db, 1, str(number), content)
+        full_bytes += len(content.encode("utf-8"))
+        content = _edit(content, rng)
+    db.commit()
+    record_seconds = time.perf_counter() - started
+
+    revisions = policy_history.list_revisions(db, 1)
+    stored_bytes = sum(len(revision.data) for revision in revisions)
+    snapshots = sum(1 for revision in revisions if revision.is_snapshot)
+
+    latencies = []
+    for number in range(1, REVISIONS + 1):
+        started = time.perf_counter()
+        policy_history.reconstruct_content(db, 1, number)
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+
+    print(f"Revisions:              {REVISIONS} ({snapshots} snapshots)")
+    print(f"Policy size:            {len(content):,} characters")
+    print(f"Full copies:            {full_bytes:,} bytes")
+    print(f"Delta-compressed:       {stored_bytes:,} bytes ({full_bytes / stored_bytes:.1f}x smaller)")
+    print(f"Record time:            {record_seconds * 1000 / REVISIONS:.2f} ms per revision")
+    print(f"Reconstruction latency: p50 {statistics.median(latencies):.2f} ms, "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f} ms, max {latencies[-1]:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark for application startup time.
+
+This script measures a cold `import main` in fresh interpreters and lists
+the modules that contribute most to it.
+
+Run with:
+    python -m benchmarks.bench_startup
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+RUNS = 10
+TOP_MODULES = 15
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE_IMPORT = """
+import time
+started = time.perf_counter()
+import main
+print(time.perf_counter() - started)
+"""
+
+
+def _run(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+
+
+def main():
+    """Run the benchmark and print the results."""
+    timings = [float(_run("-c", MEASURE_IMPORT).stdout.strip().splitlines()[-1]) * 1000 for _ in range(RUNS)]
+    print(f"import main over {RUNS} runs: min {min(timings):.0f} ms, "
+          f"median {statistics.median(timings):.0f} ms, max {max(timings):.0f} ms")
+
+    # -X importtime reports "self | cumulative | module" in microseconds on stderr
+    modules = []
+    for line in _run("-X", "importtime", "-c", "import main").stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        modules.append((int(cumulative), int(self_time), name.strip()))
+
+    print(f"\nTop {TOP_MODULES} top-level imports by cumulative time:")
+    top_level = [module for module in modules if "." not in module[2]]
+    for cumulative, self_time, name in sorted(top_level, reverse=True)[:TOP_MODULES]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
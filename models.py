@@ -5,8 +5,8 @@ This module defines SQLAlchemy ORM models for all entities in the database schem
 including Users, Roles, Assets, Risks, Policies, Incidents, and their relationships.
 """
 
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Enum, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Enum, Table, Boolean, LargeBinary, UniqueConstraint, event, inspect
+from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import func
 from sqlalchemy.ext.declarative import declarative_base
 import enum
@@ -94,6 +94,7 @@ class Asset(Base):
         asset_type: Type of asset (from AssetTypeEnum)
         description: Detailed description of the asset
         owner_id: Foreign key to User (owner)
+        updated_at: Date and time of the last change
         owner: Relationship to User model
         risks: Relationship to Risk model
         incidents: Relationship to Incident model
@@ -105,6 +106,7 @@ class Asset(Base):
     asset_type = Column(Enum(AssetTypeEnum), nullable=False)
     description = Column(Text)
     owner_id = Column(Integer, ForeignKey('users.user_id'), nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
     
     # Relationships
     owner = relationship("User", back_populates="owned_assets")
@@ -132,6 +134,7 @@ class Risk(Base):
         likelihood: Risk likelihood (1-5)
         asset_id: Foreign key to Asset
         status: Current status of the risk
+        updated_at: Date and time of the last change, including changes to its policy links
         asset: Relationship to Asset model
         policies: Relationship to Policy model (many-to-many)
     """
@@ -143,6 +146,7 @@ class Risk(Base):
     likelihood = Column(Integer, nullable=False)  # 1-5 scale
     asset_id = Column(Integer, ForeignKey('assets.asset_id'), nullable=False)
     status = Column(Enum(RiskStatusEnum), nullable=False, default=RiskStatusEnum.IDENTIFIED)
+    updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
     
     # Relationships
     asset = relationship("Asset", back_populates="risks")
@@ -168,6 +172,7 @@ class Policy(Base):
         version: Version number of the policy
         status: Current status of the policy
         risks: Relationship to Risk model (many-to-many)
+        revisions: Relationship to PolicyRevision model (deleted with the policy)
     """
     __tablename__ = 'policies'
     
@@ -179,6 +184,62 @@ class Policy(Base):
     
     # Relationships
     risks = relationship("Risk", secondary=risk_policy_link, back_populates="policies")
+    revisions = relationship(
+        "PolicyRevision", back_populates="policy", order_by="PolicyRevision.revision_number",
+        cascade="all, delete-orphan",
+    )
+
+@event.listens_for(Session, "before_flush")
+def _touch_relinked_risks(session, flush_context, instances):
+    """Stamp risks as changed when policies are linked to or unlinked from them."""
+    relinked = set()
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, Risk) and inspect(instance).attrs.policies.history.has_changes():
+            relinked.add(instance)
+        elif isinstance(instance, Policy):
+            added, _, removed = inspect(instance).attrs.risks.history
+            relinked.update(added or (), removed or ())
+    for instance in session.deleted:
+        if isinstance(instance, Policy):
+            relinked.update(instance.risks)
+    for risk in relinked:
+        risk.updated_at = func.now()
+
+class PolicyRevision(Base):
+    """
+    PolicyRevision model storing the version history of a policy.
+    
+    Revisions are stored as a zlib-compressed delta against the previous
+    revision, with a full snapshot every few revisions to bound the cost of
+    reconstructing any one of them.
+    
+    Attributes:
+        revision_id: Primary key
+        policy_id: Foreign key to Policy
+        revision_number: Sequential revision number within the policy, starting at 1
+        version: Version label of the policy at this revision
+        is_snapshot: Whether data holds the full content rather than a delta
+        data: Compressed full content or delta
+        data_length: Size of data in bytes, so listings need not load it
+        content_length: Length of the reconstructed content in characters
+        created_at: Date and time the revision was recorded
+        policy: Relationship to Policy model
+    """
+    __tablename__ = 'policy_revisions'
+    __table_args__ = (UniqueConstraint('policy_id', 'revision_number'),)
+    
+    revision_id = Column(Integer, primary_key=True, index=True)
+    policy_id = Column(Integer, ForeignKey('policies.policy_id', ondelete='CASCADE'), nullable=False, index=True)
+    revision_number = Column(Integer, nullable=False)
+    version = Column(String(20), nullable=False)
+    is_snapshot = Column(Boolean, nullable=False, default=False)
+    data = Column(LargeBinary, nullable=False)
+    data_length = Column(Integer, nullable=False)
+    content_length = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=func.now())
+    
+    # Relationships
+    policy = relationship("Policy", back_populates="revisions")
 
 class IncidentSeverityEnum(str, enum.Enum):
     """
@@ -209,6 +270,8 @@ class Incident(Base):
         severity: Severity level of the incident
         asset_id: Foreign key to Asset
         status: Current status of the incident
+        resolution: Description of how the incident was resolved
+        updated_at: Date and time of the last change
         asset: Relationship to Asset model
     """
     __tablename__ = 'incidents'
@@ -219,6 +282,8 @@ class Incident(Base):
     severity = Column(Enum(IncidentSeverityEnum), nullable=False)
     asset_id = Column(Integer, ForeignKey('assets.asset_id'), nullable=False)
     status = Column(Enum(IncidentStatusEnum), nullable=False, default=IncidentStatusEnum.OPEN)
+    resolution = Column(Text)
+    updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
     
     # Relationships
     asset = relationship("Asset", back_populates="incidents")
@@ -242,4 +307,22 @@ class AuditLog(Base):
     timestamp = Column(DateTime, nullable=False, default=func.now())
     
     # Relationships
-    user = relationship("User", back_populates="audit_logs")
\ No newline at end of file
+    user = relationship("User", back_populates="audit_logs")
+
+class CacheVersion(Base):
+    """
+    CacheVersion model holding the current version of each cached entity.
+    
+    Workers bump an entity's version after writing to it and poll this table
+    to invalidate their in-process caches.
+    
+    Attributes:
+        entity: Name of the cached entity (usually a table name)
+        version: Version number, incremented on every change
+        updated_at: Date and time of the last change
+    """
+    __tablename__ = 'cache_versions'
+    
+    entity = Column(String(100), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False, default=func.now(), onupdate=func.now())
\ No newline at end of file
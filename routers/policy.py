@@ -8,6 +8,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 
+from database import get_db
+from services import policy_history
+
 # Create router
 router = APIRouter()
 
@@ -34,4 +37,40 @@ async def update_policy(policy_id: int):
 @router.delete("/{policy_id}")
 async def delete_policy(policy_id: int):
     """Delete a specific policy."""
-    return {"message": f"This endpoint will delete policy with ID {policy_id}"}
\ No newline at end of file
+    return {"message": f"This endpoint will delete policy with ID {policy_id}"}
+
+def _revision_summary(revision) -> dict:
+    """Describe a policy revision without its stored data."""
+    return {
+        "revision_number": revision.revision_number,
+        "version": revision.version,
+        "is_snapshot": revision.is_snapshot,
+        "stored_bytes": revision.data_length,
+        "content_length": revision.content_length,
+        "created_at": revision.created_at,
+    }
+
+@router.get("/{policy_id}/versions")
+def get_policy_versions(policy_id: int, db: Session = Depends(get_db)):
+    """List all stored versions of a policy."""
+    revisions = policy_history.list_revisions(db, policy_id)
+    if not revisions:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Policy has no stored versions")
+    return {"policy_id": policy_id, "versions": [_revision_summary(revision) for revision in revisions]}
+
+@router.get("/{policy_id}/versions/diff")
+def diff_policy_versions(policy_id: int, from_revision: int, to_revision: int, db: Session = Depends(get_db)):
+    """Get a unified diff between two versions of a policy."""
+    diff = policy_history.diff_revisions(db, policy_id, from_revision, to_revision)
+    if diff is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Policy version not found")
+    return {"policy_id": policy_id, "from_revision": from_revision, "to_revision": to_revision, "diff": diff}
+
+@router.get("/{policy_id}/versions/{revision_number}")
+def get_policy_version(policy_id: int, revision_number: int, db: Session = Depends(get_db)):
+    """Get the full content of a specific version of a policy."""
+    revision = policy_history.get_revision(db, policy_id, revision_number)
+    content = policy_history.reconstruct_content(db, policy_id, revision_number) if revision else None
+    if content is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Policy version not found")
+    return {**_revision_summary(revision), "policy_id": policy_id, "policy_content": content}
\ No newline at end of file
@@ -0,0 +1,475 @@
+"""
+Admission control for MCP tools.
+
+This module provides concurrency limits, token-bucket rate limiting and
+queue-time timeouts for MCP tool calls, so that bursts of agent traffic
+cannot starve interactive REST users of the shared database. Rejected calls
+fail fast with a clear error, and per-tool latency and rejection metrics are
+recorded for monitoring.
+"""
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import anyio.to_thread
+from dotenv import load_dotenv
+from mcp.server.fastmcp.exceptions import ToolError
+
+# Load environment variables
+load_dotenv()
+
+# Number of recent latencies kept per tool for percentile estimates
+LATENCY_WINDOW = 1024
+
+ANONYMOUS_CLIENT = "anonymous"
+
+# AdmissionLimits fields enforced per client across all tools
+CLIENT_LIMITS = ("max_concurrency_per_client", "client_rate", "client_burst")
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    """Read an optional numeric setting from the environment (0 disables it)."""
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    value = float(value)
+    return value if value > 0 else None
+
+
+class AdmissionLimits(NamedTuple):
+    """
+    Limits applied to calls of a single MCP tool.
+
+    Any limit set to None is disabled. The client limits apply to each
+    client's calls across all tools, so they are taken from the controller's
+    defaults and cannot be overridden per tool.
+
+    Attributes:
+        max_concurrency: Maximum calls of the tool running at once
+        max_concurrency_per_client: Maximum calls running at once for one client
+        rate: Sustained calls per second allowed for the tool
+        burst: Token bucket capacity for the tool
+        client_rate: Sustained calls per second allowed for one client
+        client_burst: Token bucket capacity for one client
+        queue_timeout: Seconds a call may wait for a free slot before being rejected
+        max_queue: Maximum calls of the tool waiting for a free slot
+    """
+    max_concurrency: Optional[int] = 8
+    max_concurrency_per_client: Optional[int] = 2
+    rate: Optional[float] = 20.0
+    burst: Optional[float] = 40.0
+    client_rate: Optional[float] = 5.0
+    client_burst: Optional[float] = 10.0
+    queue_timeout: Optional[float] = 2.0
+    max_queue: Optional[int] = 32
+
+
+def limits_from_env() -> AdmissionLimits:
+    """
+    Build default tool limits from MCP_* environment variables.
+
+    Returns:
+        AdmissionLimits with any configured overrides applied
+    """
+    defaults = AdmissionLimits()
+
+    def _int(value: Optional[float]) -> Optional[int]:
+        return int(value) if value is not None else None
+
+    return AdmissionLimits(
+        max_concurrency=_int(_env_float("MCP_TOOL_MAX_CONCURRENCY", defaults.max_concurrency)),
+        max_concurrency_per_client=_int(_env_float("MCP_CLIENT_MAX_CONCURRENCY", defaults.max_concurrency_per_client)),
+        rate=_env_float("MCP_TOOL_RATE", defaults.rate),
+        burst=_env_float("MCP_TOOL_BURST", defaults.burst),
+        client_rate=_env_float("MCP_CLIENT_RATE", defaults.client_rate),
+        client_burst=_env_float("MCP_CLIENT_BURST", defaults.client_burst),
+        queue_timeout=_env_float("MCP_QUEUE_TIMEOUT", defaults.queue_timeout),
+        max_queue=_int(_env_float("MCP_MAX_QUEUE", defaults.max_queue)),
+    )
+
+
+class AdmissionRejected(ToolError):
+    """
+    Raised when a tool call is shed by admission control.
+
+    Attributes:
+        tool: Name of the rejected tool
+        reason: Short machine-readable rejection reason
+    """
+
+    def __init__(self, tool: str, reason: str, detail: str):
+        self.tool = tool
+        self.reason = reason
+        super().__init__(f"Tool '{tool}' rejected ({reason}): {detail}")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket rate limiter.
+
+    Attributes:
+        rate: Tokens added per second
+        capacity: Maximum number of tokens held
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """
+        Take tokens from the bucket if enough are available.
+
+        Args:
+            tokens: Number of tokens to take
+
+        Returns:
+            True if the tokens were taken, False if the caller should be rejected
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def refund(self, tokens: float = 1.0) -> None:
+        """
+        Return tokens taken for a call that was rejected before it ran.
+
+        Args:
+            tokens: Number of tokens to return
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+    def is_full(self) -> bool:
+        """Return True if the bucket has refilled to capacity, i.e. behaves like a new bucket."""
+        with self._lock:
+            return self._tokens + (self._clock() - self._updated) * self.rate >= self.capacity
+
+
+class _Slots:
+    """Concurrency slots for one key, with a count of holders and waiters."""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class ToolMetrics:
+    """
+    Latency and admission counters for a single tool.
+
+    Attributes:
+        admitted: Number of calls admitted
+        completed: Number of admitted calls that returned successfully
+        failed: Number of admitted calls that raised an error
+        rejected: Number of rejected calls by reason
+        in_flight: Number of calls currently running
+        queued: Number of calls currently waiting for a slot
+    """
+
+    def __init__(self):
+        self.admitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected: Dict[str, int] = {}
+        self.in_flight = 0
+        self.queued = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_queue_time = 0.0
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record_rejection(self, reason: str) -> None:
+        """Count a rejected call."""
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+    def record_call(self, latency: float, queue_time: float, succeeded: bool) -> None:
+        """Record the outcome of an admitted call."""
+        if succeeded:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
+        self.total_queue_time += queue_time
+        self._latencies.append(latency)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Estimate a latency percentile over the recent call window.
+
+        Args:
+            fraction: Percentile as a fraction between 0 and 1
+
+        Returns:
+            The latency in seconds, or None if no calls were recorded
+        """
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the metrics as a plain dictionary."""
+        finished = self.completed + self.failed
+        return {
+            "admitted": self.admitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": dict(self.rejected),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "latency_avg": self.total_latency / finished if finished else None,
+            "latency_p50": self.percentile(0.5),
+            "latency_p99": self.percentile(0.99),
+            "latency_max": self.max_latency if finished else None,
+            "queue_time_avg": self.total_queue_time / finished if finished else None,
+        }
+
+
+class AdmissionController:
+    """
+    Applies admission limits to MCP tool functions.
+
+    Tools are wrapped with the `limit` decorator, which rejects calls that
+    exceed their rate limits or queue depth, waits up to the queue timeout for
+    a free concurrency slot, and records per-tool metrics. Synchronous tools
+    are run in a worker thread so they do not block the event loop.
+
+    Attributes:
+        defaults: Limits used for tools that don't override them
+        max_total_concurrency: Maximum tool calls running at once across all tools
+    """
+
+    def __init__(
+        self,
+        defaults: Optional[AdmissionLimits] = None,
+        max_total_concurrency: Optional[int] = None,
+        client_resolver: Optional[Callable[[], Optional[str]]] = None,
+    ):
+        self.defaults = defaults or AdmissionLimits()
+        self.max_total_concurrency = max_total_concurrency
+        self._client_resolver = client_resolver
+        self._limits: Dict[str, AdmissionLimits] = {}
+        self._metrics: Dict[str, ToolMetrics] = {}
+        self._slots: Dict[str, _Slots] = {}
+        self._tool_buckets: Dict[str, TokenBucket] = {}
+        # Least recently used first, so idle clients can be evicted from the front
+        self._client_buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self._buckets_lock = threading.Lock()
+
+    def limit(self, name: Optional[str] = None, **overrides) -> Callable:
+        """
+        Decorator applying admission control to a tool function.
+
+        Apply it below `@mcp_server.tool()` so FastMCP registers the wrapper.
+
+        Args:
+            name: Tool name used for limits and metrics (defaults to the function name)
+            **overrides: AdmissionLimits fields to override for this tool (except CLIENT_LIMITS)
+
+        Returns:
+            A decorator producing an async tool function with the same signature
+        """
+        client_overrides = sorted(set(overrides) & set(CLIENT_LIMITS))
+        if client_overrides:
+            raise ValueError(f"Client limits apply across all tools and cannot be overridden: {client_overrides}")
+
+        def decorator(fn: Callable) -> Callable:
+            tool = name or fn.__name__
+            self._limits[tool] = self.defaults._replace(**overrides)
+            self._metrics[tool] = ToolMetrics()
+            is_async = asyncio.iscoroutinefunction(fn)
+
+            @functools.wraps(fn)
+            async def wrapper(*args, **kwargs):
+                async with self.admit(tool):
+                    if is_async:
+                        return await fn(*args, **kwargs)
+                    return await anyio.to_thread.run_sync(functools.partial(fn, *args, **kwargs))
+
+            return wrapper
+
+        return decorator
+
+    def admit(self, tool: str, client: Optional[str] = None) -> "_Admission":
+        """
+        Create an async context manager that admits one call of a tool.
+
+        Args:
+            tool: Name of the tool being called
+            client: Client identifier (resolved from the request if omitted)
+
+        Returns:
+            An async context manager; entering it raises AdmissionRejected if the call is shed
+        """
+        if tool not in self._limits:
+            self._limits[tool] = self.defaults
+            self._metrics[tool] = ToolMetrics()
+        if client is None and self._client_resolver is not None:
+            client = self._client_resolver()
+        return _Admission(self, tool, client or ANONYMOUS_CLIENT)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return admission and latency metrics for every tool.
+
+        Returns:
+            A dictionary mapping tool names to their metrics
+        """
+        return {tool: metrics.snapshot() for tool, metrics in self._metrics.items()}
+
+    def _bucket(self, buckets: Dict[str, TokenBucket], key: str, rate: float, burst: Optional[float]) -> TokenBucket:
+        """Get or create the token bucket for a key."""
+        with self._buckets_lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = TokenBucket(rate, max(burst or rate, 1.0))
+            return bucket
+
+    def _client_bucket(self, key: str, rate: float, burst: Optional[float]) -> TokenBucket:
+        """
+        Get or create the token bucket for a client, evicting idle clients.
+
+        A bucket that has refilled to capacity is indistinguishable from a new
+        one, so such buckets are dropped from the least recently used end.
+        """
+        with self._buckets_lock:
+            buckets = self._client_buckets
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = TokenBucket(rate, max(burst or rate, 1.0))
+            else:
+                buckets.move_to_end(key)
+            while len(buckets) > 1:
+                oldest_key, oldest = next(iter(buckets.items()))
+                if oldest_key == key or not oldest.is_full():
+                    break
+                del buckets[oldest_key]
+            return bucket
+
+    def _take_slots(self, keys: List[tuple]) -> List[_Slots]:
+        """Register interest in the concurrency slots for the given (key, limit) pairs."""
+        taken = []
+        for key, limit in keys:
+            slots = self._slots.get(key)
+            if slots is None:
+                slots = self._slots[key] = _Slots(limit)
+            slots.users += 1
+            taken.append(slots)
+        return taken
+
+    def _drop_slots(self, keys: List[tuple]) -> None:
+        """Release interest in slots, forgetting keys nobody is using."""
+        for key, _ in keys:
+            slots = self._slots[key]
+            slots.users -= 1
+            if slots.users == 0:
+                del self._slots[key]
+
+
+class _Admission:
+    """Async context manager holding the slots of one admitted tool call."""
+
+    def __init__(self, controller: AdmissionController, tool: str, client: str):
+        self._controller = controller
+        self._tool = tool
+        self._client = client
+        self._keys: List[tuple] = []
+        self._acquired: List[_Slots] = []
+        self._started = 0.0
+        self._queue_time = 0.0
+
+    def _reject(self, reason: str, detail: str) -> AdmissionRejected:
+        self._controller._metrics[self._tool].record_rejection(reason)
+        return AdmissionRejected(self._tool, reason, detail)
+
+    async def __aenter__(self) -> "_Admission":
+        controller = self._controller
+        limits = controller._limits[self._tool]
+        metrics = controller._metrics[self._tool]
+
+        # Cheapest and narrowest checks first, so a call rejected for its own
+        # client never spends a token from the bucket shared by all clients
+        if limits.max_queue is not None and metrics.queued >= limits.max_queue:
+            raise self._reject("queue_full", f"{metrics.queued} calls already waiting")
+        client_limits = controller.defaults
+        client_bucket = None
+        if client_limits.client_rate is not None:
+            client_bucket = controller._client_bucket(
+                self._client, client_limits.client_rate, client_limits.client_burst
+            )
+            if not client_bucket.try_acquire():
+                raise self._reject(
+                    "client_rate_limited", f"more than {client_limits.client_rate:g} calls/s for this client"
+                )
+        if limits.rate is not None:
+            bucket = controller._bucket(controller._tool_buckets, self._tool, limits.rate, limits.burst)
+            if not bucket.try_acquire():
+                if client_bucket is not None:
+                    client_bucket.refund()
+                raise self._reject("rate_limited", f"more than {limits.rate:g} calls/s for this tool")
+
+        # Slots are always taken in the same order to avoid deadlocks, narrowest
+        # first, so calls queued behind their own client's limit hold no shared slots
+        if client_limits.max_concurrency_per_client is not None:
+            self._keys.append((f"client:{self._client}", client_limits.max_concurrency_per_client))
+        if limits.max_concurrency is not None:
+            self._keys.append((f"tool:{self._tool}", limits.max_concurrency))
+        if controller.max_total_concurrency is not None:
+            self._keys.append(("global", controller.max_total_concurrency))
+        slots = controller._take_slots(self._keys)
+
+        queued_at = time.monotonic()
+        deadline = queued_at + limits.queue_timeout if limits.queue_timeout is not None else None
+        metrics.queued += 1
+        try:
+            for slot in slots:
+                timeout = None if deadline is None else max(deadline - time.monotonic(), 0.0)
+                try:
+                    await asyncio.wait_for(slot.semaphore.acquire(), timeout)
+                except asyncio.TimeoutError:
+                    raise self._reject(
+                        "queue_timeout", f"no free slot within {limits.queue_timeout:g}s"
+                    ) from None
+                self._acquired.append(slot)
+        except BaseException:
+            self._release()
+            raise
+        finally:
+            metrics.queued -= 1
+
+        self._started = time.monotonic()
+        self._queue_time = self._started - queued_at
+        metrics.admitted += 1
+        metrics.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        metrics = self._controller._metrics[self._tool]
+        metrics.in_flight -= 1
+        metrics.record_call(time.monotonic() - self._started, self._queue_time, exc_type is None)
+        self._release()
+
+    def _release(self) -> None:
+        """Give back any acquired slots and drop interest in the rest."""
+        for slot in reversed(self._acquired):
+            slot.semaphore.release()
+        self._acquired = []
+        if self._keys:
+            self._controller._drop_slots(self._keys)
+            self._keys = []
@@ -0,0 +1,414 @@
+"""
+Cross-worker cache invalidation bus.
+
+This module lets in-process caches (of policies, roles, asset lists and so
+on) stay consistent when the application runs with several workers. Writes
+bump a version number per entity; every worker learns about bumps through an
+invalidation bus and drops cache entries tagged with an older version.
+
+Two buses are provided: `LocalInvalidationBus` for a single process, and
+`TableInvalidationBus`, which shares versions through the `cache_versions`
+table of the application database (PostgreSQL or SQLite). Published bumps are
+batched into one write per entity, and a worker that cannot sync within the
+configured staleness bound stops serving cached entries until it catches up.
+`BackgroundRefresher` keeps larger in-memory structures up to date by
+reloading them when the bus reports a change.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Hashable, Iterable, List, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import CacheVersion
+
+# Load environment variables
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Seconds between polls of the shared version table
+POLL_INTERVAL = float(os.getenv("CACHE_POLL_INTERVAL", "1"))
+
+# Seconds after which a worker that has not synced stops serving cached entries
+MAX_STALENESS = float(os.getenv("CACHE_MAX_STALENESS", "5"))
+
+# Seconds to wait after a publish so bursts of writes are sent together
+BATCH_WINDOW = float(os.getenv("CACHE_BATCH_WINDOW", "0.05"))
+
+Subscriber = Callable[[str, int], None]
+
+
+class InvalidationBus:
+    """
+    Base class for invalidation buses.
+
+    Subclasses deliver published entity bumps to every worker and keep
+    `_versions` up to date.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self._subscribers: List[Subscriber] = []
+        self._lock = threading.Lock()
+
+    def publish(self, entities: Iterable[str]) -> None:
+        """
+        Announce that the given entities have changed.
+
+        Args:
+            entities: Names of the changed entities
+        """
+        raise NotImplementedError
+
+    def version(self, entity: str) -> Optional[int]:
+        """
+        Get the latest known version of an entity.
+
+        Args:
+            entity: Name of the entity
+
+        Returns:
+            The version, or None if this worker may be out of date and must not serve cached data
+        """
+        with self._lock:
+            return self._versions.get(entity, 0)
+
+    def subscribe(self, callback: Subscriber) -> None:
+        """
+        Register a callback invoked with (entity, version) whenever an entity changes.
+
+        Args:
+            callback: The function to call
+        """
+        self._subscribers.append(callback)
+
+    def start(self) -> None:
+        """Start delivering invalidations."""
+
+    def stop(self) -> None:
+        """Stop delivering invalidations and send any pending bumps."""
+
+    def _apply(self, versions: Dict[str, int]) -> None:
+        """Record newer versions and notify subscribers."""
+        changed = []
+        with self._lock:
+            for entity, version in versions.items():
+                if version > self._versions.get(entity, 0):
+                    self._versions[entity] = version
+                    changed.append((entity, version))
+        for entity, version in changed:
+            for callback in self._subscribers:
+                try:
+                    callback(entity, version)
+                except Exception:
+                    logger.exception("Cache invalidation subscriber failed for %s", entity)
+
+
+class LocalInvalidationBus(InvalidationBus):
+    """Invalidation bus for a single worker process."""
+
+    def publish(self, entities: Iterable[str]) -> None:
+        with self._lock:
+            bumped = {entity: self._versions.get(entity, 0) + 1 for entity in set(entities)}
+        self._apply(bumped)
+
+
+class TableInvalidationBus(InvalidationBus):
+    """
+    Invalidation bus sharing versions through the `cache_versions` table.
+
+    Bumps are counted per entity and written in one transaction per batch,
+    so the shared version advances by exactly as many bumps as workers
+    applied locally. A background thread performs the first sync, then writes
+    pending bumps and polls the table every `poll_interval` seconds. Until
+    the first sync, or if a worker has not synced for `max_staleness`
+    seconds, `version` returns None so caches fall back to the database.
+
+    Attributes:
+        poll_interval: Seconds between polls
+        max_staleness: Longest time a worker may serve cached entries without syncing
+        batch_window: Seconds to wait after a publish to coalesce further bumps
+    """
+
+    def __init__(
+        self,
+        engine_factory: Callable,
+        poll_interval: float = POLL_INTERVAL,
+        max_staleness: float = MAX_STALENESS,
+        batch_window: float = BATCH_WINDOW,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        super().__init__()
+        if 2 * poll_interval + batch_window >= max_staleness:
+            raise ValueError("max_staleness must exceed two poll intervals plus the batch window")
+        self.poll_interval = poll_interval
+        self.max_staleness = max_staleness
+        self.batch_window = batch_window
+        self._engine_factory = engine_factory
+        self._clock = clock
+        self._pending: Counter = Counter()
+        self._synced_at: Optional[float] = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def publish(self, entities: Iterable[str]) -> None:
+        entities = set(entities)
+        if not entities:
+            return
+        with self._lock:
+            self._pending.update(entities)
+            # This worker sees its own writes immediately; the same bumps are added to the table on sync
+            bumped = {entity: self._versions.get(entity, 0) + 1 for entity in entities}
+        self._apply(bumped)
+        self._wake.set()
+
+    def version(self, entity: str) -> Optional[int]:
+        with self._lock:
+            if self._synced_at is None or self._clock() - self._synced_at > self.max_staleness:
+                return None
+            return self._versions.get(entity, 0)
+
+    def sync(self) -> bool:
+        """
+        Write pending bumps and read the latest versions once.
+
+        Returns:
+            True if the sync succeeded
+        """
+        started = self._clock()
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        try:
+            engine = self._engine_factory()
+            with engine.begin() as connection:
+                for entity in sorted(pending):
+                    bumps = pending[entity]
+                    result = connection.execute(
+                        update(CacheVersion.__table__)
+                        .where(CacheVersion.entity == entity)
+                        .values(version=CacheVersion.version + bumps)
+                    )
+                    if result.rowcount == 0:
+                        connection.execute(CacheVersion.__table__.insert().values(entity=entity, version=bumps))
+            with engine.connect() as connection:
+                rows = connection.execute(select(CacheVersion.entity, CacheVersion.version)).all()
+        except SQLAlchemyError as exc:
+            logger.warning("Cache invalidation sync failed: %s", exc)
+            with self._lock:
+                self._pending.update(pending)
+            return False
+
+        with self._lock:
+            self._synced_at = started
+        self._apply(dict(rows))
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="cache-invalidation-bus", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self.sync()
+
+    def _run(self) -> None:
+        self.sync()
+        while not self._stopping.is_set():
+            if self._wake.wait(self.poll_interval):
+                self._wake.clear()
+                self._stopping.wait(self.batch_window)
+            self.sync()
+
+
+class VersionedCache:
+    """
+    In-process cache whose entries are invalidated through an invalidation bus.
+
+    Each entry is tagged with the entity version it was loaded under, and is
+    reloaded once the bus reports a newer version. While the bus cannot vouch
+    for freshness, values are loaded directly without being cached.
+
+    Attributes:
+        entity: Name of the entity the cached values depend on
+    """
+
+    def __init__(self, entity: str, bus: Optional[InvalidationBus] = None):
+        self.entity = entity
+        self._bus = bus
+        self._entries: Dict[Hashable, tuple] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], object]):
+        """
+        Get a cached value, loading it if missing or stale.
+
+        Args:
+            key: Cache key
+            loader: Function returning the current value
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        version = (self._bus or get_invalidation_bus()).version(self.entity)
+        if version is None:
+            return loader()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = loader()
+        with self._lock:
+            self._entries[key] = (version, value)
+        return value
+
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+
+
+class BackgroundRefresher:
+    """
+    Runs a refresh function in a background thread whenever entities change.
+
+    The refresh runs once on start and again whenever the bus reports a new
+    version of a watched entity. Changes arriving during a refresh are
+    coalesced into one follow-up run, and a failed refresh is retried after
+    `retry_interval` seconds.
+
+    Attributes:
+        entities: Names of the entities that trigger a refresh
+        retry_interval: Seconds to wait before retrying a failed refresh
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], None],
+        entities: Iterable[str],
+        bus: Optional[InvalidationBus] = None,
+        retry_interval: float = 5.0,
+        name: str = "cache-refresher",
+    ):
+        self.entities = frozenset(entities)
+        self.retry_interval = retry_interval
+        self._refresh = refresh
+        self._bus = bus
+        self._name = name
+        self._subscribed_to: Optional[InvalidationBus] = None
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Run the first refresh in the background and start following changes."""
+        if self._thread is not None:
+            return
+        bus = self._bus or get_invalidation_bus()
+        if bus is not self._subscribed_to:
+            bus.subscribe(self._on_change)
+            self._subscribed_to = bus
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop refreshing, waiting for a refresh in progress to finish."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def _on_change(self, entity: str, version: int) -> None:
+        if entity in self.entities:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wake.clear()
+            try:
+                self._refresh()
+                timeout = None
+            except Exception:
+                logger.exception("Background refresh %s failed", self._name)
+                timeout = self.retry_interval
+            self._wake.wait(timeout)
+
+
+def install_session_hooks(session_factory, bus: Optional[InvalidationBus] = None) -> None:
+    """
+    Publish invalidations for every table written through a session factory.
+
+    Tables touched by flushed inserts, updates and deletes are collected per
+    session and published once the transaction commits.
+
+    Args:
+        session_factory: sessionmaker (or Session class) to listen on
+        bus: Bus to publish to (defaults to the process-wide bus)
+    """
+    if event.contains(session_factory, "after_flush", _collect_changed_tables):
+        return
+    event.listen(session_factory, "after_flush", _collect_changed_tables)
+    event.listen(session_factory, "after_commit", lambda session: _publish_changed_tables(session, bus))
+    event.listen(session_factory, "after_rollback", lambda session: session.info.pop("changed_tables", None))
+
+
+def _collect_changed_tables(session, flush_context) -> None:
+    changed = session.info.setdefault("changed_tables", set())
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, "__tablename__", None)
+        if table is not None:
+            changed.add(table)
+    changed.discard(CacheVersion.__tablename__)
+
+
+def _publish_changed_tables(session, bus: Optional[InvalidationBus]) -> None:
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        (bus or get_invalidation_bus()).publish(changed)
+
+
+_bus: Optional[InvalidationBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_invalidation_bus() -> InvalidationBus:
+    """
+    Get the process-wide invalidation bus, creating it on first use.
+
+    The CACHE_INVALIDATION_BUS environment variable selects the implementation:
+    "table" (the default, for multiple workers) or "local".
+
+    Returns:
+        The shared invalidation bus
+    """
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                kind = os.getenv("CACHE_INVALIDATION_BUS", "table")
+                if kind == "local":
+                    _bus = LocalInvalidationBus()
+                elif kind == "table":
+                    from database import get_engine
+                    _bus = TableInvalidationBus(get_engine)
+                else:
+                    raise ValueError(f"Unknown cache invalidation bus '{kind}'")
+    return _bus
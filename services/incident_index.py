@@ -0,0 +1,340 @@
+"""
+Similar-incident retrieval service.
+
+This module provides a local, in-process similarity index over incident
+descriptions. It is used to enrich incident response prompts with the most
+similar past incidents and their resolutions without calling any external
+service.
+"""
+
+import re
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import numpy as np
+from sqlalchemy import func
+
+from models import Incident
+
+# Tokens shorter than this, and common English words, carry no signal
+MIN_TOKEN_LENGTH = 2
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has",
+    "have", "in", "is", "it", "its", "of", "on", "or", "that", "the", "this",
+    "to", "was", "were", "with",
+})
+
+# Queries whose postings exceed 1/DENSE_SCORING_RATIO of the documents are
+# scored in a dense per-document buffer rather than by sorting the postings
+DENSE_SCORING_RATIO = 16
+
+# Up to this many results are selected by repeated argmax instead of a partition
+SMALL_TOP_K = 16
+
+# Stored description snippets are truncated to keep memory bounded
+SNIPPET_LENGTH = 200
+
+# Incremental loads re-read rows updated this long before the newest change
+# already loaded, so transactions that committed late are not missed
+LOAD_OVERLAP = timedelta(minutes=1)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase index terms.
+
+    Args:
+        text: The text to tokenize
+
+    Returns:
+        The list of terms, excluding stopwords and very short tokens
+    """
+    return [
+        token for token in _TOKEN_PATTERN.findall(text.lower())
+        if len(token) >= MIN_TOKEN_LENGTH and token not in STOPWORDS
+    ]
+
+
+class SimilarIncident(NamedTuple):
+    """
+    A past incident returned by a similarity query.
+
+    Attributes:
+        incident_id: ID of the matching incident
+        score: BM25 similarity score (higher is more similar)
+        description: Truncated description of the incident
+        resolution: How the incident was resolved, if known
+    """
+    incident_id: int
+    score: float
+    description: str
+    resolution: Optional[str]
+
+
+class IncidentIndex:
+    """
+    Incrementally updated BM25 (TF-IDF) index over incident descriptions.
+
+    Postings are held in compact typed arrays (int32 document positions and
+    uint16 term frequencies) and scored with numpy, so a top-k query only
+    reads the postings of its own terms. Scores are summed in a dense
+    per-document buffer when the postings cover a large share of the index,
+    and over the sorted postings otherwise. Re-adding an incident ID replaces
+    the previous entry (or does nothing if it is unchanged); the stale entry
+    is masked out of results and no longer counts towards document
+    frequencies or the average length.
+
+    Attributes:
+        k1: BM25 term-frequency saturation parameter
+        b: BM25 length normalization parameter
+        synced_until: Newest incident change loaded by `load_incident_index`, if any
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.synced_until: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._terms: Dict[str, int] = {}
+        self._postings_docs: List[array] = []
+        self._postings_tfs: List[array] = []
+        self._document_frequencies = array("I")
+        self._doc_term_ids = array("i")
+        self._doc_term_offsets = array("Q", [0])
+        self._doc_ids = array("i")
+        self._doc_lengths = array("I")
+        self._fingerprints = array("q")
+        self._live = bytearray()
+        self._positions: Dict[int, int] = {}
+        self._descriptions: List[str] = []
+        self._resolutions: List[Optional[str]] = []
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        """Return the number of live incidents in the index."""
+        return len(self._positions)
+
+    def add(self, incident_id: int, description: str, resolution: Optional[str] = None) -> None:
+        """
+        Add an incident to the index, replacing any previous entry for its ID.
+
+        Args:
+            incident_id: The ID of the incident
+            description: The incident description to index
+            resolution: How the incident was resolved, if known
+        """
+        fingerprint = hash((description, resolution))
+        terms = tokenize(description)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+
+        with self._lock:
+            previous = self._positions.get(incident_id)
+            if previous is not None:
+                if self._fingerprints[previous] == fingerprint:
+                    return
+                self._retire(previous)
+
+            position = len(self._doc_ids)
+            for term, count in counts.items():
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    term_id = len(self._postings_docs)
+                    self._terms[term] = term_id
+                    self._postings_docs.append(array("i"))
+                    self._postings_tfs.append(array("H"))
+                    self._document_frequencies.append(0)
+                self._postings_docs[term_id].append(position)
+                self._postings_tfs[term_id].append(min(count, 0xFFFF))
+                self._document_frequencies[term_id] += 1
+                self._doc_term_ids.append(term_id)
+            self._doc_term_offsets.append(len(self._doc_term_ids))
+
+            self._doc_ids.append(incident_id)
+            self._doc_lengths.append(len(terms))
+            self._fingerprints.append(fingerprint)
+            self._live.append(1)
+            self._descriptions.append(description[:SNIPPET_LENGTH])
+            self._resolutions.append(resolution)
+            self._positions[incident_id] = position
+            self._total_length += len(terms)
+
+    def remove(self, incident_id: int) -> None:
+        """
+        Remove an incident from the index, if present.
+
+        Args:
+            incident_id: The ID of the incident
+        """
+        with self._lock:
+            position = self._positions.pop(incident_id, None)
+            if position is not None:
+                self._retire(position)
+
+    def incident_ids(self) -> List[int]:
+        """Return the IDs of the live incidents in the index."""
+        with self._lock:
+            return list(self._positions)
+
+    def _retire(self, position: int) -> None:
+        """Mask out an entry and stop counting it in the collection statistics."""
+        self._live[position] = 0
+        self._total_length -= self._doc_lengths[position]
+        start, end = self._doc_term_offsets[position], self._doc_term_offsets[position + 1]
+        for term_id in self._doc_term_ids[start:end]:
+            self._document_frequencies[term_id] -= 1
+
+    def add_many(self, incidents: Iterable) -> None:
+        """
+        Add several incidents to the index.
+
+        Args:
+            incidents: Incident model instances (or objects with matching attributes)
+        """
+        for incident in incidents:
+            self.add(
+                incident.incident_id,
+                incident.incident_description,
+                getattr(incident, "resolution", None),
+            )
+
+    def search(self, text: str, k: int = 5, exclude_id: Optional[int] = None) -> List[SimilarIncident]:
+        """
+        Find the incidents most similar to the given text.
+
+        Args:
+            text: The description to match against
+            k: Maximum number of results to return
+            exclude_id: Incident ID to leave out of the results (e.g. the query incident itself)
+
+        Returns:
+            Up to k similar incidents, most similar first
+        """
+        query_terms = set(tokenize(text))
+        if k <= 0 or not query_terms:
+            return []
+
+        with self._lock:
+            live_count = len(self._positions)
+            if live_count == 0:
+                return []
+            doc_count = len(self._doc_ids)
+            lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+            average_length = max(self._total_length / live_count, 1.0)
+
+            matched_docs = []
+            matched_scores = []
+            for term in query_terms:
+                term_id = self._terms.get(term)
+                if term_id is None:
+                    continue
+                docs = np.frombuffer(self._postings_docs[term_id], dtype=np.int32)
+                tfs = np.frombuffer(self._postings_tfs[term_id], dtype=np.uint16).astype(np.float32)
+                document_frequency = self._document_frequencies[term_id]
+                idf = np.log(1.0 + (live_count - document_frequency + 0.5) / (document_frequency + 0.5))
+                # tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average_length)), computed in place
+                denominators = lengths[docs].astype(np.float32)
+                denominators *= np.float32(self.k1 * self.b / average_length)
+                denominators += np.float32(self.k1 * (1.0 - self.b))
+                denominators += tfs
+                tfs *= np.float32(idf * (self.k1 + 1.0))
+                tfs /= denominators
+                matched_docs.append(docs.copy())
+                matched_scores.append(tfs)
+                del docs
+            del lengths
+            if not matched_docs:
+                return []
+
+            postings = np.concatenate(matched_docs)
+            weights = np.concatenate(matched_scores)
+            if len(postings) * DENSE_SCORING_RATIO >= doc_count:
+                # Many postings: accumulate into a dense buffer, one slot per document
+                scores = np.bincount(postings, weights=weights, minlength=doc_count)
+                scores *= np.frombuffer(self._live, dtype=np.uint8)
+                candidates = None
+            else:
+                # Few postings: sorting them is cheaper than touching every document
+                candidates, inverse = np.unique(postings, return_inverse=True)
+                scores = np.bincount(inverse, weights=weights)
+                scores *= np.frombuffer(self._live, dtype=np.uint8)[candidates]
+            if exclude_id is not None and exclude_id in self._positions:
+                excluded = self._positions[exclude_id]
+                if candidates is None:
+                    scores[excluded] = 0.0
+                else:
+                    scores[candidates == excluded] = 0.0
+
+            top = _top_k(scores, k)
+            positions = top if candidates is None else candidates[top]
+            return [
+                SimilarIncident(
+                    incident_id=self._doc_ids[position],
+                    score=score,
+                    description=self._descriptions[position],
+                    resolution=self._resolutions[position],
+                )
+                for position, score in zip(positions.tolist(), scores[top].tolist())
+                if score > 0.0
+            ]
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the k highest scores, highest first."""
+    k = min(k, len(scores))
+    if k <= SMALL_TOP_K:
+        # A few linear argmax passes beat a partition of the whole buffer
+        scores = scores.copy()
+        top = np.empty(k, dtype=np.intp)
+        for rank in range(k):
+            top[rank] = np.argmax(scores)
+            scores[top[rank]] = -np.inf
+        return top
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+# Process-wide index used by the MCP service
+incident_index = IncidentIndex()
+
+
+def load_incident_index(db, index: Optional[IncidentIndex] = None, batch_size: int = 10000) -> int:
+    """
+    Bring an incident index up to date with the database.
+
+    The first load reads every incident. Later loads read only incidents
+    updated since the index's `synced_until` watermark (less LOAD_OVERLAP),
+    and drop deleted incidents when the row count shows there are any.
+
+    Args:
+        db: SQLAlchemy session
+        index: The index to load (defaults to the process-wide index)
+        batch_size: Number of rows fetched per round trip
+
+    Returns:
+        The number of incidents in the index after loading
+    """
+    index = incident_index if index is None else index
+    query = db.query(
+        Incident.incident_id, Incident.incident_description, Incident.resolution, Incident.updated_at
+    ).order_by(Incident.incident_id)
+    if index.synced_until is not None:
+        query = query.filter(Incident.updated_at >= index.synced_until - LOAD_OVERLAP)
+
+    synced_until = index.synced_until
+    for incident in query.yield_per(batch_size):
+        index.add(incident.incident_id, incident.incident_description, incident.resolution)
+        if synced_until is None or incident.updated_at > synced_until:
+            synced_until = incident.updated_at
+    index.synced_until = synced_until
+
+    if db.query(func.count(Incident.incident_id)).scalar() != len(index):
+        stored = {incident_id for (incident_id,) in db.query(Incident.incident_id)}
+        for incident_id in index.incident_ids():
+            if incident_id not in stored:
+                index.remove(incident_id)
+    return len(index)
@@ -5,14 +5,132 @@ This module provides integration with MCP for AI-powered features.
 """
 
 from mcp.server.fastmcp import FastMCP
+import itertools
+import json
 import os
+import weakref
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
 
+from database import SessionLocal, dispose_engine, get_engine
+from services.admission import AdmissionController, limits_from_env
+from services.cache_bus import BackgroundRefresher, get_invalidation_bus, install_session_hooks
+from services.incident_index import incident_index, load_incident_index
+from services.risk_register import risk_register
+
 # Load environment variables
 load_dotenv()
 
+# Number of similar past incidents included in incident response prompts
+SIMILAR_INCIDENT_COUNT = 3
+
+def _refresh_incident_index():
+    """Load new and changed incidents into the incident index."""
+    db = SessionLocal()
+    try:
+        load_incident_index(db)
+    finally:
+        db.close()
+
+def _refresh_risk_register():
+    """Rebuild the risk register snapshot from the database."""
+    db = SessionLocal()
+    try:
+        risk_register.refresh(db)
+    finally:
+        db.close()
+
+# Keep the incident index and risk register in step with their tables
+incident_index_refresher = BackgroundRefresher(_refresh_incident_index, ["incidents"], name="incident-index")
+risk_register_refresher = BackgroundRefresher(
+    _refresh_risk_register, ["risks", "assets"], name="risk-register"
+)
+
+@asynccontextmanager
+async def lifespan(server: FastMCP):
+    """
+    Manage MCP server resources.
+    
+    The incident index and risk register snapshot are loaded in the
+    background when the server starts, so it can accept requests
+    immediately, and are refreshed whenever the cache invalidation bus
+    reports a change to their tables.
+    """
+    get_engine()
+    invalidation_bus = get_invalidation_bus()
+    install_session_hooks(SessionLocal, invalidation_bus)
+    invalidation_bus.start()
+    incident_index_refresher.start()
+    risk_register_refresher.start()
+    try:
+        yield {}
+    finally:
+        risk_register_refresher.stop()
+        incident_index_refresher.stop()
+        invalidation_bus.stop()
+        dispose_engine()
+
 # Initialize MCP server
-mcp_server = FastMCP("ISMS-AI")
+mcp_server = FastMCP("ISMS-AI", lifespan=lifespan)
+
+# Sequential IDs for client sessions; unlike id(), they are never reused
+_session_ids: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_session_counter = itertools.count(1)
+
+def _current_client() -> Optional[str]:
+    """
+    Identify the client making the current MCP request.
+    
+    Returns:
+        The client ID sent by the client, else an ID for its session, or None outside a request
+    """
+    try:
+        request_context = mcp_server.get_context().request_context
+    except (LookupError, ValueError):
+        return None
+    client_id = getattr(request_context.meta, "client_id", None) if request_context.meta else None
+    if client_id:
+        return client_id
+    session_id = _session_ids.get(request_context.session)
+    if session_id is None:
+        session_id = _session_ids.setdefault(request_context.session, f"session-{next(_session_counter)}")
+    return session_id
+
+# Admission control shared by all MCP tools
+admission = AdmissionController(
+    defaults=limits_from_env(),
+    max_total_concurrency=int(os.getenv("MCP_MAX_TOTAL_CONCURRENCY", "16")) or None,
+    client_resolver=_current_client,
+)
+
+@mcp_server.resource("metrics://admission")
+def get_admission_metrics() -> str:
+    """
+    Retrieve MCP tool admission and latency metrics as a resource.
+    
+    Returns:
+        Per-tool metrics as a JSON string
+    """
+    return json.dumps(admission.metrics(), indent=2)
+
+@mcp_server.resource("risk://register/summary")
+def get_risk_register_summary() -> str:
+    """
+    Retrieve an overview of the risk register as a resource.
+    
+    Returns:
+        Risk counts by status and asset type, the severity/likelihood heatmap
+        and the number of risks without a linked policy, as a JSON string
+    """
+    snapshot = risk_register.snapshot
+    return json.dumps({
+        "total_risks": len(snapshot),
+        "by_status": {status.value: count for status, count in snapshot.count_by("status").items()},
+        "by_asset_type": {asset_type.value: count for asset_type, count in snapshot.count_by("asset_type").items()},
+        "heatmap": snapshot.heatmap().tolist(),
+        "uncovered_risks": len(snapshot.filter(uncovered=True)),
+    }, indent=2)
 
 @mcp_server.resource("policy://{policy_id}")
 def get_policy_resource(policy_id: str) -> str:
@@ -30,6 +148,7 @@ def get_policy_resource(policy_id: str) -> str:
     return f"Policy content for policy ID: {policy_id}"
 
 @mcp_server.tool()
+@admission.limit()
 def analyze_risk(asset_name: str, threat_description: str) -> str:
     """
     Analyze a security risk for a given asset.
@@ -49,6 +168,32 @@ def analyze_risk(asset_name: str, threat_description: str) -> str:
            f"- Recommended actions: Implement access controls, monitor for suspicious activity"
 
 @mcp_server.tool()
+@admission.limit()
+def list_top_risks(
+    count: int = 10,
+    status: Optional[str] = None,
+    asset_type: Optional[str] = None,
+    uncovered_only: bool = False,
+) -> str:
+    """
+    List the highest-scoring risks in the risk register.
+    
+    Args:
+        count: Maximum number of risks to list
+        status: Only risks with this status (e.g. "Identified")
+        asset_type: Only risks on assets of this type (e.g. "Data")
+        uncovered_only: Only risks with no linked policy
+        
+    Returns:
+        The risks, highest severity times likelihood first, as a JSON string
+    """
+    snapshot = risk_register.snapshot
+    risk_ids = snapshot.filter(status=status, asset_type=asset_type, uncovered=True if uncovered_only else None)
+    risks = [snapshot.risk(risk_id) for risk_id in snapshot.top_risks(count, risk_ids)]
+    return json.dumps(risks, indent=2)
+
+@mcp_server.tool()
+@admission.limit()
 def suggest_policy_updates(policy_content: str, new_requirements: str) -> str:
     """
     Suggest updates to a policy based on new requirements.
@@ -72,19 +217,38 @@ def incident_response_prompt(incident_description: str) -> str:
     """
     Create a prompt for incident response guidance.
     
+    The prompt is enriched with the most similar past incidents from the
+    local incident index, along with how they were resolved.
+    
     Args:
         incident_description: Description of the security incident
         
     Returns:
         A prompt for the LLM to provide incident response guidance
     """
+    similar_incidents = incident_index.search(incident_description, k=SIMILAR_INCIDENT_COUNT)
+    similar_section = ""
+    if similar_incidents:
+        lines = []
+        for similar in similar_incidents:
+            resolution = similar.resolution or "No resolution recorded"
+            lines.append(
+                f"    - Incident #{similar.incident_id}: {similar.description}\n"
+                f"      Resolution: {resolution}"
+            )
+        similar_section = (
+            "\n    Similar past incidents and how they were resolved:\n\n"
+            + "\n".join(lines)
+            + "\n    "
+        )
+
     return f"""
     You are a cybersecurity incident response expert. 
     
     A security incident has been reported with the following description:
     
     {incident_description}
-    
+    {similar_section}
     Please provide:
     1. Initial assessment of the incident severity
     2. Immediate actions to take
@@ -0,0 +1,305 @@
+"""
+Policy revision history service.
+
+This module stores every revision of a policy's content as a compact delta
+against its predecessor, with periodic full snapshots, and reconstructs or
+diffs any revision on demand. Session hooks record a revision whenever a
+policy's content or version is committed.
+"""
+
+import difflib
+import json
+import zlib
+from typing import List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, defer
+
+from models import Policy, PolicyRevision
+
+# A full snapshot is stored at least every this many revisions
+SNAPSHOT_INTERVAL = 10
+
+COMPRESSION_LEVEL = 6
+
+
+def _compress(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def _decompress(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+def encode_delta(old: str, new: str) -> bytes:
+    """
+    Encode the line-level changes turning one text into another.
+
+    The delta is a compressed JSON list of operations applied in order to the
+    old lines: a positive integer copies that many lines, a negative integer
+    skips that many lines, and a string inserts a new line.
+
+    Args:
+        old: The previous text
+        new: The new text
+
+    Returns:
+        The compressed delta
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    operations: list = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            operations.append(i2 - i1)
+            continue
+        if i2 > i1:
+            operations.append(i1 - i2)
+        operations.extend(new_lines[j1:j2])
+    return _compress(json.dumps(operations, separators=(",", ":")))
+
+
+def apply_delta(old: str, delta: bytes) -> str:
+    """
+    Apply a delta produced by `encode_delta` to the text it was computed from.
+
+    Args:
+        old: The previous text
+        delta: The compressed delta
+
+    Returns:
+        The new text
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines: List[str] = []
+    position = 0
+    for operation in json.loads(_decompress(delta)):
+        if isinstance(operation, str):
+            new_lines.append(operation)
+        elif operation > 0:
+            new_lines.extend(old_lines[position:position + operation])
+            position += operation
+        else:
+            position -= operation
+    return "".join(new_lines)
+
+
+def get_revision(db: Session, policy_id: int, revision_number: Optional[int] = None) -> Optional[PolicyRevision]:
+    """
+    Get a revision of a policy, without loading its stored data.
+
+    Args:
+        db: SQLAlchemy session
+        policy_id: The ID of the policy
+        revision_number: The revision to get (defaults to the latest)
+
+    Returns:
+        The revision, or None if it does not exist
+    """
+    query = db.query(PolicyRevision).options(defer(PolicyRevision.data)).filter(PolicyRevision.policy_id == policy_id)
+    if revision_number is not None:
+        return query.filter(PolicyRevision.revision_number == revision_number).first()
+    return query.order_by(PolicyRevision.revision_number.desc()).first()
+
+
+def list_revisions(db: Session, policy_id: int) -> List[PolicyRevision]:
+    """
+    List all revisions of a policy, oldest first, without loading their stored data.
+
+    Args:
+        db: SQLAlchemy session
+        policy_id: The ID of the policy
+
+    Returns:
+        The revisions of the policy
+    """
+    return (
+        db.query(PolicyRevision)
+        .options(defer(PolicyRevision.data))
+        .filter(PolicyRevision.policy_id == policy_id)
+        .order_by(PolicyRevision.revision_number)
+        .all()
+    )
+
+
+def _load_chain(db: Session, policy_id: int, revision_number: int, first_revision: Optional[int] = None) -> list:
+    """
+    Fetch the rows needed to rebuild revisions of a policy in a single query.
+
+    The chain starts at the nearest snapshot at or before `first_revision`
+    (defaults to `revision_number`) and ends at `revision_number`.
+    """
+    first_revision = revision_number if first_revision is None else first_revision
+    snapshot_number = (
+        db.query(PolicyRevision.revision_number)
+        .filter(
+            PolicyRevision.policy_id == policy_id,
+            PolicyRevision.revision_number <= first_revision,
+            PolicyRevision.is_snapshot.is_(True),
+        )
+        .order_by(PolicyRevision.revision_number.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    chain = (
+        db.query(PolicyRevision.revision_number, PolicyRevision.is_snapshot, PolicyRevision.data)
+        .filter(
+            PolicyRevision.policy_id == policy_id,
+            PolicyRevision.revision_number >= snapshot_number,
+            PolicyRevision.revision_number <= revision_number,
+        )
+        .order_by(PolicyRevision.revision_number)
+        .all()
+    )
+    if not chain or chain[-1].revision_number != revision_number:
+        return []
+    return chain
+
+
+def _apply_chain(chain: list, wanted: Optional[set] = None) -> dict:
+    """Rebuild content along a chain, returning it for the wanted revisions (default: the last)."""
+    wanted = {chain[-1].revision_number} if wanted is None else wanted
+    contents = {}
+    content = ""
+    for link in chain:
+        content = _decompress(link.data) if link.is_snapshot else apply_delta(content, link.data)
+        if link.revision_number in wanted:
+            contents[link.revision_number] = content
+    return contents
+
+
+def reconstruct_content(db: Session, policy_id: int, revision_number: int) -> Optional[str]:
+    """
+    Rebuild the content of a policy revision.
+
+    The nearest snapshot at or before the revision and the deltas after it
+    are fetched in a single query and applied in order.
+
+    Args:
+        db: SQLAlchemy session
+        policy_id: The ID of the policy
+        revision_number: The revision to rebuild
+
+    Returns:
+        The policy content at that revision, or None if the revision does not exist
+    """
+    chain = _load_chain(db, policy_id, revision_number)
+    return _apply_chain(chain)[revision_number] if chain else None
+
+
+def record_revision(db: Session, policy_id: int, version: str, content: str) -> Optional[PolicyRevision]:
+    """
+    Record a new revision of a policy's content.
+
+    The revision is stored as a delta against the latest revision, unless
+    SNAPSHOT_INTERVAL revisions have passed since the last snapshot or the
+    delta would not be smaller than a snapshot. The caller is responsible for
+    committing the session.
+
+    Args:
+        db: SQLAlchemy session
+        policy_id: The ID of the policy
+        version: Version label of the new revision
+        content: Full content of the new revision
+
+    Returns:
+        The new revision, or None if the content and version are unchanged
+    """
+    latest = get_revision(db, policy_id)
+    snapshot = _compress(content)
+    revision_number = latest.revision_number + 1 if latest else 1
+    is_snapshot = True
+    data = snapshot
+
+    if latest is not None:
+        chain = _load_chain(db, policy_id, latest.revision_number)
+        previous = _apply_chain(chain)[latest.revision_number]
+        if previous == content and latest.version == version:
+            return None
+        if revision_number - chain[0].revision_number < SNAPSHOT_INTERVAL:
+            delta = encode_delta(previous, content)
+            if len(delta) < len(snapshot):
+                is_snapshot = False
+                data = delta
+
+    revision = PolicyRevision(
+        policy_id=policy_id,
+        revision_number=revision_number,
+        version=version,
+        is_snapshot=is_snapshot,
+        data=data,
+        data_length=len(data),
+        content_length=len(content),
+    )
+    db.add(revision)
+    db.flush()
+    return revision
+
+
+def diff_revisions(db: Session, policy_id: int, from_revision: int, to_revision: int) -> Optional[str]:
+    """
+    Produce a unified diff between two revisions of a policy.
+
+    Both revisions are rebuilt from a single chain of stored revisions.
+
+    Args:
+        db: SQLAlchemy session
+        policy_id: The ID of the policy
+        from_revision: The revision to diff from
+        to_revision: The revision to diff to
+
+    Returns:
+        The unified diff, or None if either revision does not exist
+    """
+    chain = _load_chain(db, policy_id, max(from_revision, to_revision), min(from_revision, to_revision))
+    contents = _apply_chain(chain, {from_revision, to_revision}) if chain else {}
+    if from_revision not in contents or to_revision not in contents:
+        return None
+    old, new = contents[from_revision], contents[to_revision]
+    return "\n".join(difflib.unified_diff(
+        old.splitlines(),
+        new.splitlines(),
+        fromfile=f"revision {from_revision}",
+        tofile=f"revision {to_revision}",
+        lineterm="",
+    ))
+
+
+def install_revision_hooks(session_factory) -> None:
+    """
+    Record a policy revision whenever a policy's content or version is committed.
+
+    Policies inserted, or updated in `policy_content` or `version`, are
+    collected as they are flushed; their revisions are recorded in the same
+    transaction just before it commits.
+
+    Args:
+        session_factory: sessionmaker (or Session class) to listen on
+    """
+    if event.contains(session_factory, "before_commit", _record_changed_policies):
+        return
+    event.listen(session_factory, "after_flush", _collect_changed_policies)
+    event.listen(session_factory, "before_commit", _record_changed_policies)
+    event.listen(session_factory, "after_rollback", lambda session: session.info.pop("changed_policies", None))
+
+
+def _collect_changed_policies(session, flush_context) -> None:
+    changed = session.info.setdefault("changed_policies", set())
+    for instance in session.new:
+        if isinstance(instance, Policy):
+            changed.add(instance.policy_id)
+    for instance in session.dirty:
+        if isinstance(instance, Policy):
+            attributes = inspect(instance).attrs
+            if attributes.policy_content.history.has_changes() or attributes.version.history.has_changes():
+                changed.add(instance.policy_id)
+
+
+def _record_changed_policies(session) -> None:
+    session.flush()
+    changed = session.info.pop("changed_policies", None)
+    for policy_id in sorted(changed or ()):
+        policy = session.get(Policy, policy_id)
+        if policy is not None:
+            record_revision(session, policy_id, policy.version, policy.policy_content)
@@ -0,0 +1,435 @@
+"""
+In-memory risk register snapshot service.
+
+This module keeps a compact, read-only copy of the `risks`, `assets` and
+`risk_policy_links` tables for analytics such as heatmaps, coverage reports
+and MCP tools. Columns are held as numpy arrays (int32 IDs, small integer enum
+codes) with CSR adjacency between risks and policies, so filter, group and
+top-N queries run in memory without touching the database.
+"""
+
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+from sqlalchemy import func, or_, true
+from sqlalchemy.orm import Session
+
+from models import Asset, AssetTypeEnum, Risk, RiskStatusEnum, risk_policy_link
+
+RISK_STATUSES = list(RiskStatusEnum)
+ASSET_TYPES = list(AssetTypeEnum)
+
+# Code stored for a risk whose asset is not (yet) in the snapshot
+UNKNOWN_CODE = 255
+
+_EMPTY_IDS = np.empty(0, dtype=np.int32)
+
+# Refreshes re-read rows updated this long before the newest change already
+# loaded, so transactions that committed late are not missed
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+def _codes(values: Iterable, members: List) -> np.ndarray:
+    """Encode enum values as uint8 positions in their enum."""
+    lookup = {member: code for code, member in enumerate(members)}
+    return np.fromiter((lookup[value] for value in values), dtype=np.uint8)
+
+
+class RiskRegisterSnapshot:
+    """
+    Immutable columnar snapshot of the risk register.
+
+    Risks and assets are sorted by ID so rows are found with a binary search.
+    Risk-to-policy links are stored as CSR adjacency in both directions.
+
+    Attributes:
+        risk_ids: Risk IDs (int32, sorted)
+        risk_asset_ids: Asset ID of each risk (int32)
+        severity: Severity of each risk, 1-5 (int8)
+        likelihood: Likelihood of each risk, 1-5 (int8)
+        status: Status of each risk as a code into RISK_STATUSES (uint8)
+        asset_type: Type of each risk's asset as a code into ASSET_TYPES (uint8)
+        asset_ids: Asset IDs (int32, sorted)
+        asset_types: Type of each asset as a code into ASSET_TYPES (uint8)
+        asset_owner_ids: Owner user ID of each asset (int32)
+        policy_indptr: CSR row pointers from risk rows into policy_indices
+        policy_indices: Linked policy IDs, grouped by risk (int32)
+        policy_ids: IDs of policies linked to at least one risk (int32, sorted)
+        risk_indptr: CSR row pointers from policy_ids rows into risk_indices
+        risk_indices: Linked risk IDs, grouped by policy (int32)
+    """
+
+    def __init__(self, risks: Dict[str, np.ndarray], assets: Dict[str, np.ndarray], links: np.ndarray):
+        self.risk_ids = risks["risk_id"]
+        self.risk_asset_ids = risks["asset_id"]
+        self.severity = risks["severity"]
+        self.likelihood = risks["likelihood"]
+        self.status = risks["status"]
+
+        self.asset_ids = assets["asset_id"]
+        self.asset_types = assets["asset_type"]
+        self.asset_owner_ids = assets["owner_id"]
+
+        # Denormalize the asset type onto risks for single-pass filters
+        self.asset_type = np.full(len(self.risk_ids), UNKNOWN_CODE, dtype=np.uint8)
+        if len(self.asset_ids):
+            rows = np.minimum(np.searchsorted(self.asset_ids, self.risk_asset_ids), len(self.asset_ids) - 1)
+            found = self.asset_ids[rows] == self.risk_asset_ids
+            self.asset_type[found] = self.asset_types[rows[found]]
+
+        # Links are (risk_id, policy_id) pairs sorted by risk then policy
+        link_risks, link_policies = links[:, 0], links[:, 1]
+        self.policy_indptr = np.append(
+            np.searchsorted(link_risks, self.risk_ids), len(links)
+        ).astype(np.int64)
+        self.policy_indices = np.ascontiguousarray(link_policies)
+
+        order = np.lexsort((link_risks, link_policies))
+        by_policy = link_policies[order]
+        self.policy_ids, starts = np.unique(by_policy, return_index=True)
+        self.risk_indptr = np.append(starts, len(by_policy)).astype(np.int64)
+        self.risk_indices = np.ascontiguousarray(link_risks[order])
+
+    def __len__(self) -> int:
+        """Return the number of risks in the snapshot."""
+        return len(self.risk_ids)
+
+    @property
+    def risk_score(self) -> np.ndarray:
+        """Return severity times likelihood for each risk."""
+        return self.severity.astype(np.int16) * self.likelihood
+
+    @property
+    def policy_counts(self) -> np.ndarray:
+        """Return the number of policies linked to each risk."""
+        return np.diff(self.policy_indptr)
+
+    def _risk_row(self, risk_id: int) -> Optional[int]:
+        row = int(np.searchsorted(self.risk_ids, risk_id))
+        if row < len(self.risk_ids) and self.risk_ids[row] == risk_id:
+            return row
+        return None
+
+    def filter(
+        self,
+        status: Optional[RiskStatusEnum] = None,
+        asset_type: Optional[AssetTypeEnum] = None,
+        asset_id: Optional[int] = None,
+        min_severity: Optional[int] = None,
+        min_likelihood: Optional[int] = None,
+        min_score: Optional[int] = None,
+        uncovered: Optional[bool] = None,
+    ) -> np.ndarray:
+        """
+        Select risks matching all given criteria.
+
+        Args:
+            status: Only risks with this status
+            asset_type: Only risks on assets of this type
+            asset_id: Only risks on this asset
+            min_severity: Only risks with at least this severity
+            min_likelihood: Only risks with at least this likelihood
+            min_score: Only risks whose severity times likelihood is at least this
+            uncovered: If True only risks with no linked policy, if False only covered risks
+
+        Returns:
+            Matching risk IDs (int32, ascending)
+        """
+        mask = np.ones(len(self.risk_ids), dtype=bool)
+        if status is not None:
+            mask &= self.status == RISK_STATUSES.index(RiskStatusEnum(status))
+        if asset_type is not None:
+            mask &= self.asset_type == ASSET_TYPES.index(AssetTypeEnum(asset_type))
+        if asset_id is not None:
+            mask &= self.risk_asset_ids == asset_id
+        if min_severity is not None:
+            mask &= self.severity >= min_severity
+        if min_likelihood is not None:
+            mask &= self.likelihood >= min_likelihood
+        if min_score is not None:
+            mask &= self.risk_score >= min_score
+        if uncovered is not None:
+            mask &= (self.policy_counts == 0) == uncovered
+        return self.risk_ids[mask]
+
+    def count_by(self, field: str) -> Dict:
+        """
+        Count risks grouped by a column.
+
+        Args:
+            field: One of "status", "asset_type", "severity", "likelihood" or "asset_id"
+
+        Returns:
+            A dictionary mapping each group (enum member or integer) to its risk count
+        """
+        if field == "status":
+            counts = np.bincount(self.status, minlength=len(RISK_STATUSES))
+            return {member: int(counts[code]) for code, member in enumerate(RISK_STATUSES)}
+        if field == "asset_type":
+            known = self.asset_type[self.asset_type != UNKNOWN_CODE]
+            counts = np.bincount(known, minlength=len(ASSET_TYPES))
+            return {member: int(counts[code]) for code, member in enumerate(ASSET_TYPES)}
+        if field in ("severity", "likelihood", "asset_id"):
+            column = self.risk_asset_ids if field == "asset_id" else getattr(self, field)
+            values, counts = np.unique(column, return_counts=True)
+            return dict(zip(values.tolist(), counts.tolist()))
+        raise ValueError(f"Cannot group risks by '{field}'")
+
+    def heatmap(self, scale: int = 5) -> np.ndarray:
+        """
+        Count risks by severity and likelihood.
+
+        Args:
+            scale: Highest severity/likelihood value
+
+        Returns:
+            A (scale x scale) matrix; entry [s-1, l-1] counts risks with severity s and likelihood l
+        """
+        severity = np.clip(self.severity.astype(np.intp), 1, scale) - 1
+        likelihood = np.clip(self.likelihood.astype(np.intp), 1, scale) - 1
+        counts = np.bincount(severity * scale + likelihood, minlength=scale * scale)
+        return counts.reshape(scale, scale)
+
+    def top_risks(self, n: int = 10, risk_ids: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Return the highest-scoring risks by severity times likelihood.
+
+        Ties are broken by severity, then by ascending risk ID.
+
+        Args:
+            n: Number of risks to return
+            risk_ids: Restrict the ranking to these risks (e.g. the result of `filter`);
+                IDs not in the snapshot are ignored
+
+        Returns:
+            Up to n risk IDs, highest score first
+        """
+        if risk_ids is None:
+            rows = np.arange(len(self.risk_ids))
+        elif len(self.risk_ids) == 0:
+            return []
+        else:
+            rows = np.minimum(np.searchsorted(self.risk_ids, risk_ids), len(self.risk_ids) - 1)
+            rows = np.unique(rows[self.risk_ids[rows] == risk_ids])
+        if n <= 0 or len(rows) == 0:
+            return []
+        key = self.risk_score[rows].astype(np.int32) * 8 + self.severity[rows]
+        if n < len(rows):
+            candidates = np.argpartition(-key, n - 1)[:n]
+            threshold = key[candidates].min()
+            candidates = np.flatnonzero(key >= threshold)
+        else:
+            candidates = np.arange(len(rows))
+        order = np.lexsort((self.risk_ids[rows[candidates]], -key[candidates]))[:n]
+        return self.risk_ids[rows[candidates[order]]].tolist()
+
+    def risk(self, risk_id: int) -> Optional[Dict]:
+        """
+        Get the stored columns of one risk.
+
+        Args:
+            risk_id: The ID of the risk
+
+        Returns:
+            The risk's fields (enum members for status and asset type, None for
+            an unknown asset type), or None if the risk is not in the snapshot
+        """
+        row = self._risk_row(risk_id)
+        if row is None:
+            return None
+        asset_type = int(self.asset_type[row])
+        return {
+            "risk_id": risk_id,
+            "asset_id": int(self.risk_asset_ids[row]),
+            "asset_type": ASSET_TYPES[asset_type] if asset_type != UNKNOWN_CODE else None,
+            "severity": int(self.severity[row]),
+            "likelihood": int(self.likelihood[row]),
+            "status": RISK_STATUSES[self.status[row]],
+            "policy_ids": self.policies_for_risk(risk_id).tolist(),
+        }
+
+    def policies_for_risk(self, risk_id: int) -> np.ndarray:
+        """Return the IDs of policies linked to a risk."""
+        row = self._risk_row(risk_id)
+        if row is None:
+            return _EMPTY_IDS
+        return self.policy_indices[self.policy_indptr[row]:self.policy_indptr[row + 1]]
+
+    def risks_for_policy(self, policy_id: int) -> np.ndarray:
+        """Return the IDs of risks linked to a policy."""
+        row = int(np.searchsorted(self.policy_ids, policy_id))
+        if row >= len(self.policy_ids) or self.policy_ids[row] != policy_id:
+            return _EMPTY_IDS
+        return self.risk_indices[self.risk_indptr[row]:self.risk_indptr[row + 1]]
+
+
+def _empty_columns(spec: Dict[str, type]) -> Dict[str, np.ndarray]:
+    return {name: np.empty(0, dtype=dtype) for name, dtype in spec.items()}
+
+
+_RISK_COLUMNS = {"risk_id": np.int32, "asset_id": np.int32, "severity": np.int8,
+                 "likelihood": np.int8, "status": np.uint8}
+_ASSET_COLUMNS = {"asset_id": np.int32, "asset_type": np.uint8, "owner_id": np.int32}
+
+
+def _merge(columns: Dict[str, np.ndarray], key: str, changed: np.ndarray,
+           fresh: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Replace rows whose key is in `changed` with `fresh` rows, keeping key order."""
+    keep = ~np.isin(columns[key], changed)
+    merged = {name: np.concatenate([column[keep], fresh[name]]) for name, column in columns.items()}
+    order = np.argsort(merged[key], kind="stable")
+    return {name: column[order] for name, column in merged.items()}
+
+
+class RiskRegisterCache:
+    """
+    Keeps an up-to-date RiskRegisterSnapshot in process memory.
+
+    New and updated rows are picked up from `updated_at` watermarks (a risk
+    is also stamped when its policy links change), and deleted rows are found
+    when the row counts disagree. Rows can also be queued for reloading with
+    `mark_changed`. Each refresh fetches only those rows and publishes a new
+    immutable snapshot, so readers never see partial updates.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._risks = _empty_columns(_RISK_COLUMNS)
+        self._assets = _empty_columns(_ASSET_COLUMNS)
+        self._links = np.empty((0, 2), dtype=np.int32)
+        self._risks_synced_until: Optional[datetime] = None
+        self._assets_synced_until: Optional[datetime] = None
+        self._changed_risks: Set[int] = set()
+        self._changed_assets: Set[int] = set()
+        self._snapshot = RiskRegisterSnapshot(self._risks, self._assets, self._links)
+
+    @property
+    def snapshot(self) -> RiskRegisterSnapshot:
+        """Return the current snapshot; it never changes once published."""
+        return self._snapshot
+
+    def mark_changed(self, entity: str, entity_id: int) -> None:
+        """
+        Queue a row to be reloaded on the next refresh, whatever its `updated_at`.
+
+        Args:
+            entity: "risk" or "asset"
+            entity_id: ID of the changed row
+        """
+        with self._lock:
+            if entity == "risk":
+                self._changed_risks.add(entity_id)
+            elif entity == "asset":
+                self._changed_assets.add(entity_id)
+            else:
+                raise ValueError(f"Unknown risk register entity '{entity}'")
+
+    def refresh(self, db: Session, full: bool = False) -> RiskRegisterSnapshot:
+        """
+        Load new, changed and deleted rows from the database and publish a new snapshot.
+
+        Args:
+            db: SQLAlchemy session
+            full: Reload every row, e.g. after restoring a database whose timestamps went backwards
+
+        Returns:
+            The refreshed snapshot
+        """
+        with self._lock:
+            changed_risks, self._changed_risks = self._changed_risks, set()
+            changed_assets, self._changed_assets = self._changed_assets, set()
+            state = (self._risks, self._assets, self._links, self._risks_synced_until, self._assets_synced_until)
+            if full:
+                self._risks = _empty_columns(_RISK_COLUMNS)
+                self._assets = _empty_columns(_ASSET_COLUMNS)
+                self._links = np.empty((0, 2), dtype=np.int32)
+                self._risks_synced_until = self._assets_synced_until = None
+
+            try:
+                self._refresh_assets(db, changed_assets)
+                self._refresh_risks(db, changed_risks)
+            except Exception:
+                self._risks, self._assets, self._links, self._risks_synced_until, self._assets_synced_until = state
+                self._changed_risks |= changed_risks
+                self._changed_assets |= changed_assets
+                raise
+
+            self._snapshot = RiskRegisterSnapshot(self._risks, self._assets, self._links)
+            return self._snapshot
+
+    def _refresh_assets(self, db: Session, changed: Set[int]) -> None:
+        condition = _changed_since(Asset, self._assets_synced_until)
+        if changed:
+            condition = or_(condition, Asset.asset_id.in_(changed))
+        rows = db.query(Asset.asset_id, Asset.asset_type, Asset.owner_id, Asset.updated_at).filter(condition).all()
+
+        asset_ids, asset_types, owner_ids, updated = zip(*rows) if rows else ((),) * 4
+        fresh = {
+            "asset_id": np.array(asset_ids, dtype=np.int32),
+            "asset_type": _codes(asset_types, ASSET_TYPES),
+            "owner_id": np.array(owner_ids, dtype=np.int32),
+        }
+        stale = np.union1d(np.fromiter(changed, dtype=np.int32, count=len(changed)), fresh["asset_id"])
+        stale = np.union1d(stale, _deleted_ids(db, Asset.asset_id, self._assets["asset_id"], fresh["asset_id"]))
+        self._assets = _merge(self._assets, "asset_id", stale, fresh)
+        self._assets_synced_until = max((self._assets_synced_until, *updated), key=_as_sortable)
+
+    def _refresh_risks(self, db: Session, changed: Set[int]) -> None:
+        condition = _changed_since(Risk, self._risks_synced_until)
+        if changed:
+            condition = or_(condition, Risk.risk_id.in_(changed))
+        rows = db.query(
+            Risk.risk_id, Risk.asset_id, Risk.severity, Risk.likelihood, Risk.status, Risk.updated_at
+        ).filter(condition).all()
+        links = (
+            db.query(risk_policy_link.c.risk_id, risk_policy_link.c.policy_id)
+            .join(Risk, Risk.risk_id == risk_policy_link.c.risk_id)
+            .filter(condition)
+            .all()
+        )
+
+        risk_ids, asset_ids, severities, likelihoods, statuses, updated = zip(*rows) if rows else ((),) * 6
+        fresh = {
+            "risk_id": np.array(risk_ids, dtype=np.int32),
+            "asset_id": np.array(asset_ids, dtype=np.int32),
+            "severity": np.array(severities, dtype=np.int8),
+            "likelihood": np.array(likelihoods, dtype=np.int8),
+            "status": _codes(statuses, RISK_STATUSES),
+        }
+        stale = np.union1d(np.fromiter(changed, dtype=np.int32, count=len(changed)), fresh["risk_id"])
+        stale = np.union1d(stale, _deleted_ids(db, Risk.risk_id, self._risks["risk_id"], fresh["risk_id"]))
+        self._risks = _merge(self._risks, "risk_id", stale, fresh)
+
+        fresh_links = np.array(links, dtype=np.int32).reshape(-1, 2)
+        kept_links = self._links[~np.isin(self._links[:, 0], stale)]
+        merged_links = np.concatenate([kept_links, fresh_links])
+        # Drop links whose risk was deleted or has not been loaded yet
+        merged_links = merged_links[np.isin(merged_links[:, 0], self._risks["risk_id"])]
+        self._links = merged_links[np.lexsort((merged_links[:, 1], merged_links[:, 0]))]
+        self._risks_synced_until = max((self._risks_synced_until, *updated), key=_as_sortable)
+
+
+def _changed_since(model, synced_until: Optional[datetime]):
+    """Filter for rows updated since a watermark, less REFRESH_OVERLAP (all rows if there is none)."""
+    if synced_until is None:
+        return true()
+    return model.updated_at >= synced_until - REFRESH_OVERLAP
+
+
+def _as_sortable(value: Optional[datetime]) -> datetime:
+    return datetime.min if value is None else value
+
+
+def _deleted_ids(db: Session, id_column, cached: np.ndarray, fresh: np.ndarray) -> np.ndarray:
+    """Find cached IDs whose rows are gone, checking the row count before listing IDs."""
+    loaded = np.union1d(cached, fresh)
+    if db.query(func.count(id_column)).scalar() == len(loaded):
+        return _EMPTY_IDS
+    stored = np.array([row_id for (row_id,) in db.query(id_column)], dtype=np.int32)
+    return np.setdiff1d(loaded, stored)
+
+
+# Process-wide risk register cache
+risk_register = RiskRegisterCache()
@@ -0,0 +1,57 @@
+"""
+Shared pytest fixtures for the ISMS test suite.
+
+This module provides an in-memory database wired into the API, and a
+query-budget fixture for catching N+1 regressions in router tests.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import get_db
+from main import app
+from models import Base
+from tests.query_budget import query_budget as _query_budget
+
+@pytest.fixture
+def db_engine():
+    """Create an in-memory SQLite engine with all tables."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db_session(db_engine):
+    """Create a session on the in-memory database."""
+    session = sessionmaker(autocommit=False, autoflush=False, bind=db_engine)()
+    yield session
+    session.close()
+
+@pytest.fixture
+def api_client(db_session):
+    """Create a test client whose requests use the in-memory database."""
+    def override_get_db():
+        yield db_session
+
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+@pytest.fixture
+def query_budget(db_engine):
+    """
+    Provide a context manager enforcing a query budget on the in-memory database.
+
+    Usage:
+        with query_budget(2):
+            api_client.get("/api/policies/1/versions")
+    """
+    def budget(max_queries, allow_duplicates=False):
+        return _query_budget(db_engine, max_queries, allow_duplicates)
+
+    return budget
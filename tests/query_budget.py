@@ -0,0 +1,76 @@
+"""
+Query-count guard for tests.
+
+This module records the SQL statements an engine executes and fails a test
+when a block of code issues more statements than its budget, or issues the
+same statement more than once (the usual sign of an N+1 query).
+"""
+
+import re
+from collections import Counter
+from contextlib import contextmanager
+from sqlalchemy import event
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class QueryRecorder:
+    """
+    Records statements executed on an engine.
+
+    Attributes:
+        statements: SQL text of every statement executed, in order
+    """
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, connection, cursor, statement, parameters, context, executemany):
+        self.statements.append(_WHITESPACE.sub(" ", statement).strip())
+
+    @property
+    def count(self):
+        """Return the number of statements executed."""
+        return len(self.statements)
+
+    def duplicates(self):
+        """Return statements executed more than once, with their counts."""
+        return {statement: count for statement, count in Counter(self.statements).items() if count > 1}
+
+    def report(self):
+        """Describe the recorded statements for a failure message."""
+        return "\n".join(f"  {number}. {statement}" for number, statement in enumerate(self.statements, start=1))
+
+
+@contextmanager
+def query_budget(engine, max_queries, allow_duplicates=False):
+    """
+    Fail if the enclosed block exceeds its query budget or repeats a statement.
+
+    Statements are compared by SQL text, so the same query issued with
+    different parameters (for example once per related row) counts as a
+    duplicate.
+
+    Args:
+        engine: SQLAlchemy engine to watch
+        max_queries: Maximum number of statements allowed
+        allow_duplicates: Whether repeated statements are acceptable
+
+    Yields:
+        QueryRecorder: The recorder collecting statements
+    """
+    recorder = QueryRecorder()
+    event.listen(engine, "before_cursor_execute", recorder)
+    try:
+        yield recorder
+    finally:
+        event.remove(engine, "before_cursor_execute", recorder)
+
+    assert recorder.count <= max_queries, (
+        f"Expected at most {max_queries} queries, {recorder.count} were issued:\n{recorder.report()}"
+    )
+    if not allow_duplicates:
+        duplicates = recorder.duplicates()
+        assert not duplicates, "Duplicate queries issued (possible N+1):\n" + "\n".join(
+            f"  {count}x {statement}" for statement, count in duplicates.items()
+        )
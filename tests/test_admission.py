@@ -0,0 +1,201 @@
+"""
+Tests for MCP tool admission control.
+
+This module contains tests for rate limiting, concurrency limits and
+queue-time timeouts applied to MCP tools.
+"""
+
+import asyncio
+import pytest
+from services.admission import AdmissionController, AdmissionLimits, AdmissionRejected, TokenBucket
+
+UNLIMITED = AdmissionLimits(
+    max_concurrency=None, max_concurrency_per_client=None, rate=None, burst=None,
+    client_rate=None, client_burst=None, queue_timeout=None, max_queue=None,
+)
+
+def test_token_bucket_refills_over_time():
+    """Test that the token bucket allows bursts and refills at its rate."""
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, capacity=2.0, clock=lambda: now[0])
+    assert bucket.try_acquire()
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    now[0] = 0.5
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+
+def test_client_rate_limit_rejects_runaway_client():
+    """Test that one client exceeding its rate is rejected without affecting others."""
+    controller = AdmissionController(defaults=UNLIMITED._replace(client_rate=0.001, client_burst=2))
+
+    @controller.limit()
+    def tool():
+        return "ok"
+
+    async def call(client):
+        async with controller.admit("tool", client=client):
+            return True
+
+    async def scenario():
+        assert await call("agent")
+        assert await call("agent")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await call("agent")
+        assert rejected.value.reason == "client_rate_limited"
+        assert await call("analyst")
+
+    asyncio.run(scenario())
+    assert controller.metrics()["tool"]["rejected"] == {"client_rate_limited": 1}
+
+def test_concurrency_limit_times_out_queued_calls():
+    """Test that calls waiting longer than the queue timeout are shed."""
+    controller = AdmissionController(defaults=UNLIMITED._replace(max_concurrency=1, queue_timeout=0.05))
+
+    @controller.limit()
+    async def slow_tool():
+        await asyncio.sleep(0.2)
+        return "done"
+
+    async def scenario():
+        return await asyncio.gather(slow_tool(), slow_tool(), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert results[0] == "done"
+    assert isinstance(results[1], AdmissionRejected)
+    assert results[1].reason == "queue_timeout"
+    metrics = controller.metrics()["slow_tool"]
+    assert metrics["completed"] == 1
+    assert metrics["rejected"] == {"queue_timeout": 1}
+    assert metrics["latency_max"] >= 0.2
+
+def test_queued_calls_run_when_slot_frees():
+    """Test that queued calls are admitted once a slot is released."""
+    controller = AdmissionController(defaults=UNLIMITED._replace(max_concurrency=1, queue_timeout=1.0))
+    running = []
+
+    @controller.limit()
+    async def tool(number):
+        running.append(number)
+        assert len(running) == 1
+        await asyncio.sleep(0.01)
+        running.remove(number)
+        return number
+
+    async def scenario():
+        return await asyncio.gather(*(tool(number) for number in range(3)))
+
+    assert asyncio.run(scenario()) == [0, 1, 2]
+    assert controller.metrics()["tool"]["admitted"] == 3
+
+def test_runaway_client_does_not_drain_shared_rate_limit():
+    """Test that calls rejected by a client's own rate limit leave the tool's tokens for others."""
+    controller = AdmissionController(defaults=AdmissionLimits(queue_timeout=None))
+
+    async def call(client):
+        async with controller.admit("tool", client=client):
+            return True
+
+    async def scenario():
+        for _ in range(100):
+            try:
+                await call("agent")
+            except AdmissionRejected as rejected:
+                assert rejected.reason == "client_rate_limited"
+        return await call("analyst")
+
+    assert asyncio.run(scenario())
+    assert set(controller.metrics()["tool"]["rejected"]) == {"client_rate_limited"}
+
+def test_client_limits_span_all_tools():
+    """Test that a client's rate and concurrency limits are shared by all tools."""
+    controller = AdmissionController(
+        defaults=UNLIMITED._replace(max_concurrency_per_client=1, client_rate=0.001, client_burst=2, queue_timeout=0.05)
+    )
+    async def call(tool, client="agent"):
+        async with controller.admit(tool, client=client):
+            await asyncio.sleep(0.1)
+
+    async def scenario():
+        return await asyncio.gather(call("first"), call("second"), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert results[0] is None
+    assert results[1].reason == "queue_timeout"
+    with pytest.raises(AdmissionRejected) as rejected:
+        asyncio.run(call("third"))
+    assert rejected.value.reason == "client_rate_limited"
+    asyncio.run(call("third", client="analyst"))
+    with pytest.raises(ValueError):
+        controller.limit(client_rate=100.0)
+
+def test_runaway_client_does_not_hold_shared_slots():
+    """Test that calls queued behind a client's own limit leave global slots free for others."""
+    controller = AdmissionController(
+        defaults=UNLIMITED._replace(max_concurrency_per_client=2, queue_timeout=5.0),
+        max_total_concurrency=4,
+    )
+
+    @controller.limit()
+    async def tool():
+        await asyncio.sleep(0.3)
+        return "done"
+
+    async def call(client):
+        async with controller.admit("tool", client=client):
+            return await tool.__wrapped__()
+
+    async def scenario():
+        runaway = [asyncio.ensure_future(call("agent")) for _ in range(8)]
+        await asyncio.sleep(0.01)
+        # Served alongside the runaway client's first calls, not after its queue drains
+        interactive = await asyncio.wait_for(call("analyst"), 0.5)
+        await asyncio.gather(*runaway, return_exceptions=True)
+        return interactive
+
+    assert asyncio.run(scenario()) == "done"
+
+def test_idle_client_buckets_are_evicted():
+    """Test that client rate buckets are dropped once they have refilled."""
+    controller = AdmissionController(defaults=UNLIMITED._replace(client_rate=1000.0, client_burst=1))
+
+    async def call(client):
+        async with controller.admit("tool", client=client):
+            return True
+
+    async def scenario():
+        await call("first")
+        await asyncio.sleep(0.01)
+        await call("second")
+
+    asyncio.run(scenario())
+    assert list(controller._client_buckets) == ["second"]
+
+def test_sessions_without_client_id_get_distinct_stable_ids(monkeypatch):
+    """Test that each MCP session is identified by its own ID, reused for its later calls."""
+    from types import SimpleNamespace
+    from services import mcp_service
+
+    class Session:
+        pass
+
+    first, second = Session(), Session()
+    current = []
+    monkeypatch.setattr(mcp_service.mcp_server, "get_context", lambda: SimpleNamespace(
+        request_context=SimpleNamespace(meta=None, session=current[-1])))
+    current.append(first)
+    first_id = mcp_service._current_client()
+    assert mcp_service._current_client() == first_id
+    current.append(second)
+    assert mcp_service._current_client() != first_id
+
+def test_mcp_tools_are_admission_controlled():
+    """Test that MCP tool calls are admitted and recorded in the metrics."""
+    from services.mcp_service import admission, mcp_server
+
+    async def scenario():
+        return await mcp_server.call_tool("analyze_risk", {"asset_name": "CRM", "threat_description": "Phishing"})
+
+    result = asyncio.run(scenario())
+    assert "Risk analysis for CRM" in result[0].text
+    assert admission.metrics()["analyze_risk"]["completed"] >= 1
@@ -0,0 +1,143 @@
+"""
+Tests for the cross-worker cache invalidation bus.
+
+This module contains tests for sharing entity versions between workers,
+bounding staleness and publishing invalidations from session commits.
+"""
+
+import threading
+import time
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from models import Base, CacheVersion, Policy
+from services.cache_bus import (
+    BackgroundRefresher, LocalInvalidationBus, TableInvalidationBus, VersionedCache, install_session_hooks,
+)
+
+@pytest.fixture
+def engine(tmp_path):
+    """Create a file-backed SQLite database shared by simulated workers."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'isms.db'}")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+def _worker_bus(engine, clock=None):
+    """Create a table-backed bus as one worker would."""
+    kwargs = {"clock": clock} if clock else {}
+    bus = TableInvalidationBus(lambda: engine, poll_interval=1, max_staleness=5, **kwargs)
+    bus.sync()
+    return bus
+
+def test_bumps_reach_other_workers(engine):
+    """Test that a bump published by one worker invalidates another worker's cache."""
+    worker_a, worker_b = _worker_bus(engine), _worker_bus(engine)
+    cache = VersionedCache("policies", bus=worker_b)
+    loads = []
+    loader = lambda: loads.append(1) or len(loads)
+
+    assert cache.get("all", loader) == 1
+    assert cache.get("all", loader) == 1
+
+    worker_a.publish(["policies"])
+    assert worker_a.sync()
+    assert cache.get("all", loader) == 1
+    assert worker_b.sync()
+    assert cache.get("all", loader) == 2
+
+def test_publishes_are_coalesced(engine):
+    """Test that repeated bumps of an entity before a sync are written in one batch."""
+    worker = _worker_bus(engine)
+    for _ in range(5):
+        worker.publish(["roles", "assets"])
+    worker.publish(["assets"])
+    worker.sync()
+    with engine.connect() as connection:
+        versions = dict(connection.execute(CacheVersion.__table__.select().with_only_columns(
+            CacheVersion.entity, CacheVersion.version)).all())
+    assert versions == {"assets": 6, "roles": 5}
+    assert (worker.version("assets"), worker.version("roles")) == (6, 5)
+
+def test_batched_bumps_do_not_hide_other_workers_writes(engine):
+    """Test that a worker publishing twice in one batch still sees a later write by another worker."""
+    worker_a, worker_b = _worker_bus(engine), _worker_bus(engine)
+    cache = VersionedCache("policies", bus=worker_a)
+    loads = []
+    loader = lambda: loads.append(1) or len(loads)
+
+    worker_a.publish(["policies"])
+    worker_a.publish(["policies"])
+    assert cache.get("all", loader) == 1
+    assert worker_a.sync()
+
+    worker_b.publish(["policies"])
+    assert worker_b.sync()
+    assert worker_a.sync()
+    assert worker_a.version("policies") == worker_b.version("policies") == 3
+    assert cache.get("all", loader) == 2
+
+def test_first_sync_runs_in_background(engine):
+    """Test that starting the bus does not wait for the database."""
+    database_ready = threading.Event()
+    bus = TableInvalidationBus(lambda: database_ready.wait() and engine, poll_interval=0.05, max_staleness=1)
+    bus.start()
+    try:
+        assert bus.version("assets") is None
+        database_ready.set()
+        deadline = time.monotonic() + 5
+        while bus.version("assets") is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert bus.version("assets") == 0
+    finally:
+        bus.stop()
+
+def test_stale_worker_stops_serving_cache(engine):
+    """Test that a worker that cannot sync bypasses its cache after the staleness bound."""
+    now = [0.0]
+    worker = _worker_bus(engine, clock=lambda: now[0])
+    cache = VersionedCache("assets", bus=worker)
+    loads = []
+    loader = lambda: loads.append(1) or len(loads)
+
+    cache.get("all", loader)
+    now[0] = 4.0
+    assert cache.get("all", loader) == 1
+    now[0] = 6.0
+    assert worker.version("assets") is None
+    assert cache.get("all", loader) == 2
+    assert cache.get("all", loader) == 3
+
+def test_session_commit_publishes_changed_tables(engine):
+    """Test that committing a write publishes its table and a rollback does not."""
+    bus = LocalInvalidationBus()
+    session_factory = sessionmaker(bind=engine)
+    install_session_hooks(session_factory, bus)
+    received = []
+    bus.subscribe(lambda entity, version: received.append((entity, version)))
+
+    session = session_factory()
+    session.add(Policy(policy_title="Backup", policy_content="...", version="1.0"))
+    session.flush()
+    session.rollback()
+    assert received == []
+
+    session.add(Policy(policy_title="Backup", policy_content="...", version="1.0"))
+    session.commit()
+    assert received == [("policies", 1)]
+    session.close()
+
+def test_background_refresher_follows_watched_entities():
+    """Test that a refresher runs on start and again only when a watched entity changes."""
+    bus = LocalInvalidationBus()
+    refreshed = threading.Semaphore(0)
+    refresher = BackgroundRefresher(refreshed.release, ["incidents"], bus=bus)
+    refresher.start()
+    try:
+        assert refreshed.acquire(timeout=5)
+        bus.publish(["assets"])
+        assert not refreshed.acquire(timeout=0.1)
+        bus.publish(["incidents"])
+        assert refreshed.acquire(timeout=5)
+    finally:
+        refresher.stop()
@@ -0,0 +1,126 @@
+"""
+Tests for the similar-incident retrieval service.
+
+This module contains tests for the incident similarity index and the
+incident response prompt enrichment.
+"""
+
+import asyncio
+import time
+import pytest
+from sqlalchemy.orm import sessionmaker
+from models import Incident, IncidentSeverityEnum
+from services.incident_index import IncidentIndex, load_incident_index, tokenize
+from services import cache_bus, mcp_service
+from services.mcp_service import incident_response_prompt
+
+@pytest.fixture
+def index():
+    """Create an index with a few sample incidents."""
+    index = IncidentIndex()
+    index.add(1, "Phishing email with credential harvesting link sent to finance team",
+              "Blocked sender domain and reset affected passwords")
+    index.add(2, "Ransomware encrypted the shared file server", "Restored from offline backup")
+    index.add(3, "Brute force login attempts against the VPN gateway", "Enabled MFA and rate limiting")
+    return index
+
+def test_tokenize():
+    """Test that tokenization lowercases and drops stopwords."""
+    assert tokenize("The VPN is DOWN, a 2FA issue") == ["vpn", "down", "2fa", "issue"]
+
+def test_search_ranks_most_similar_first(index):
+    """Test that the most similar incident is returned first."""
+    results = index.search("phishing email targeting finance", k=2)
+    assert results[0].incident_id == 1
+    assert results[0].resolution == "Blocked sender domain and reset affected passwords"
+
+def test_search_skips_unrelated_incidents(index):
+    """Test that incidents sharing no terms with the query are not returned."""
+    results = index.search("ransomware", k=3)
+    assert [result.incident_id for result in results] == [2]
+    assert index.search("unrelated words only", k=3) == []
+
+def test_add_replaces_existing_incident(index):
+    """Test that re-adding an incident replaces its previous entry."""
+    index.add(2, "Malware beacon detected on laptop", "Reimaged the laptop")
+    assert len(index) == 3
+    assert index.search("ransomware", k=3) == []
+    assert index.search("malware laptop", k=3)[0].resolution == "Reimaged the laptop"
+
+def test_search_excludes_given_incident(index):
+    """Test that the query incident itself can be excluded."""
+    results = index.search("brute force login", k=3, exclude_id=3)
+    assert all(result.incident_id != 3 for result in results)
+
+def test_incident_response_prompt_includes_similar_incidents(monkeypatch, index):
+    """Test that the incident response prompt lists similar past incidents."""
+    monkeypatch.setattr("services.mcp_service.incident_index", index)
+    prompt = incident_response_prompt("VPN login brute force detected")
+    assert "Incident #3" in prompt
+    assert "Enabled MFA and rate limiting" in prompt
+
+def test_replaced_incidents_do_not_skew_scores(index):
+    """Test that re-adding incidents leaves scores as if indexed once."""
+    for _ in range(5):
+        index.add(2, "Ransomware encrypted the shared file server", "Restored from offline backup")
+    fresh = IncidentIndex()
+    fresh.add(1, "Phishing email with credential harvesting link sent to finance team")
+    fresh.add(2, "Ransomware encrypted the shared file server")
+    fresh.add(3, "Brute force login attempts against the VPN gateway")
+    assert index.search("ransomware server", k=1)[0].score == pytest.approx(fresh.search("ransomware server", k=1)[0].score)
+
+def _incident(incident_id, description):
+    """Build an incident row for the given ID and description."""
+    return Incident(incident_id=incident_id, incident_description=description,
+                    severity=IncidentSeverityEnum.HIGH, asset_id=1)
+
+def _wait_for(condition, timeout=5):
+    """Poll until a condition holds or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_load_tracks_database_changes(db_session):
+    """Test that repeated loads pick up new, updated and deleted incidents."""
+    db_session.add_all([_incident(1, "Phishing email sent to finance"), _incident(2, "Ransomware on file server")])
+    db_session.commit()
+    index = IncidentIndex()
+    assert load_incident_index(db_session, index) == 2
+    assert index.synced_until is not None
+
+    db_session.get(Incident, 2).resolution = "Restored from offline backup"
+    db_session.add(_incident(3, "Brute force login against the VPN"))
+    db_session.delete(db_session.get(Incident, 1))
+    db_session.commit()
+    assert load_incident_index(db_session, index) == 2
+    assert sorted(index.incident_ids()) == [2, 3]
+    assert index.search("ransomware", k=1)[0].resolution == "Restored from offline backup"
+    assert index.search("phishing", k=1) == []
+
+def test_mcp_lifespan_loads_index_and_follows_commits(monkeypatch, db_engine):
+    """Test that the MCP server loads the index on startup and indexes committed incidents."""
+    session_factory = sessionmaker(bind=db_engine)
+    index = IncidentIndex()
+    monkeypatch.setenv("CACHE_INVALIDATION_BUS", "local")
+    monkeypatch.setattr(cache_bus, "_bus", None)
+    monkeypatch.setattr("services.incident_index.incident_index", index)
+    monkeypatch.setattr(mcp_service, "SessionLocal", session_factory)
+    monkeypatch.setattr(mcp_service, "get_engine", lambda: db_engine)
+    monkeypatch.setattr(mcp_service, "dispose_engine", lambda: None)
+    seed = session_factory()
+    seed.add(_incident(1, "Phishing email sent to finance"))
+    seed.commit()
+    seed.close()
+
+    async def run_server():
+        async with mcp_service.lifespan(mcp_service.mcp_server):
+            assert await asyncio.to_thread(_wait_for, lambda: len(index) == 1)
+            session = session_factory()
+            session.add(_incident(2, "Ransomware on file server"))
+            session.commit()
+            session.close()
+            assert await asyncio.to_thread(_wait_for, lambda: len(index) == 2)
+
+    asyncio.run(run_server())
+    assert index.search("ransomware", k=1)[0].incident_id == 2
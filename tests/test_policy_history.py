@@ -0,0 +1,133 @@
+"""
+Tests for policy version history.
+
+This module contains tests for delta encoding, revision storage and the
+policy version endpoints.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import get_db
+from main import app
+from models import Base, Policy, PolicyRevision
+from services import policy_history
+
+BASE_CONTENT = "".join(f"{number}. Access to system {number} requires approval.\n" for number in range(1, 51))
+
+@pytest.fixture
+def db():
+    """Create an in-memory database with one policy."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Policy(policy_id=1, policy_title="Access Control", policy_content=BASE_CONTENT, version="1.0"))
+    session.commit()
+    yield session
+    session.close()
+
+def _revise(content, number):
+    """Change one line and append another."""
+    content = content.replace(f"system {number} requires", f"system {number} (revised) requires")
+    return content + f"Amendment {number}.\n"
+
+def test_delta_round_trip():
+    """Test that applying an encoded delta reproduces the new text."""
+    old = "a\nb\nc\nd"
+    new = "a\nB\nc\nd\ne"
+    assert policy_history.apply_delta(old, policy_history.encode_delta(old, new)) == new
+    assert policy_history.apply_delta(old, policy_history.encode_delta(old, "")) == ""
+
+def test_revisions_are_stored_as_deltas_with_periodic_snapshots(db):
+    """Test that revisions are delta-encoded and every revision can be rebuilt."""
+    contents = [BASE_CONTENT]
+    for number in range(1, 25):
+        contents.append(_revise(contents[-1], number))
+    for number, content in enumerate(contents):
+        policy_history.record_revision(db, 1, f"1.{number}", content)
+    db.commit()
+
+    revisions = policy_history.list_revisions(db, 1)
+    assert all("data" not in vars(revision) for revision in revisions)
+    assert [revision.revision_number for revision in revisions if revision.is_snapshot] == [1, 11, 21]
+    assert all(revision.data_length == len(revision.data) for revision in revisions[:3])
+    assert sum(revision.data_length for revision in revisions) < sum(len(content) for content in contents) / 10
+    for number, content in enumerate(contents, start=1):
+        assert policy_history.reconstruct_content(db, 1, number) == content
+
+def test_unchanged_revision_is_not_recorded(db):
+    """Test that recording identical content and version is a no-op."""
+    assert policy_history.record_revision(db, 1, "1.0", BASE_CONTENT) is not None
+    assert policy_history.record_revision(db, 1, "1.0", BASE_CONTENT) is None
+    assert db.query(PolicyRevision).count() == 1
+
+def test_policy_version_endpoints(db):
+    """Test listing, fetching and diffing policy versions through the API."""
+    policy_history.record_revision(db, 1, "1.0", BASE_CONTENT)
+    policy_history.record_revision(db, 1, "1.1", _revise(BASE_CONTENT, 7))
+    db.commit()
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        response = client.get("/api/policies/1/versions")
+        assert response.status_code == 200
+        assert [version["version"] for version in response.json()["versions"]] == ["1.0", "1.1"]
+
+        response = client.get("/api/policies/1/versions/2")
+        assert response.status_code == 200
+        assert "system 7 (revised) requires" in response.json()["policy_content"]
+
+        response = client.get("/api/policies/1/versions/diff", params={"from_revision": 1, "to_revision": 2})
+        assert response.status_code == 200
+        assert "+7. Access to system 7 (revised) requires approval." in response.json()["diff"]
+
+        assert client.get("/api/policies/1/versions/3").status_code == 404
+        assert client.get("/api/policies/2/versions").status_code == 404
+    finally:
+        app.dependency_overrides.clear()
+
+def test_committed_policy_changes_are_recorded():
+    """Test that session hooks record a revision for each committed content or version change."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    policy_history.install_revision_hooks(session_factory)
+    session = session_factory()
+
+    session.add(Policy(policy_id=1, policy_title="Access Control", policy_content=BASE_CONTENT, version="1.0"))
+    session.commit()
+    policy = session.get(Policy, 1)
+    policy.policy_content = _revise(BASE_CONTENT, 1)
+    policy.version = "1.1"
+    session.commit()
+    policy.policy_title = "Access Control Policy"
+    session.commit()
+    policy.policy_content = "Discarded draft.\n"
+    session.flush()
+    session.rollback()
+
+    assert [revision.version for revision in policy_history.list_revisions(session, 1)] == ["1.0", "1.1"]
+    assert policy_history.reconstruct_content(session, 1, 2) == _revise(BASE_CONTENT, 1)
+    session.close()
+
+def test_deleting_a_policy_deletes_its_history():
+    """Test that a policy with recorded revisions can be deleted, taking its history with it."""
+    engine = create_engine("sqlite://")
+    event.listen(engine, "connect", lambda connection, record: connection.execute("PRAGMA foreign_keys=ON"))
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    policy_history.install_revision_hooks(session_factory)
+    session = session_factory()
+
+    session.add(Policy(policy_id=1, policy_title="Access Control", policy_content=BASE_CONTENT, version="1.0"))
+    session.commit()
+    session.get(Policy, 1).policy_content = _revise(BASE_CONTENT, 1)
+    session.commit()
+    assert len(policy_history.list_revisions(session, 1)) == 2
+
+    session.delete(session.get(Policy, 1))
+    session.commit()
+    assert session.query(PolicyRevision).count() == 0
+    session.close()
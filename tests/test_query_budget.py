@@ -0,0 +1,94 @@
+"""
+Query-count regression tests for the API routers.
+
+This module declares a query budget for every route of the five routers
+and fails when a request exceeds it or issues duplicate statements.
+"""
+
+import pytest
+from main import app
+from models import Role, User, Asset, Risk, Policy, Incident, AssetTypeEnum, IncidentSeverityEnum
+from services import policy_history
+
+# (method, route template, request path, query budget)
+ROUTE_BUDGETS = [
+    ("GET", "/api/users/", "/api/users/", 0),
+    ("GET", "/api/users/{user_id}", "/api/users/1", 0),
+    ("POST", "/api/users/", "/api/users/", 0),
+    ("PUT", "/api/users/{user_id}", "/api/users/1", 0),
+    ("DELETE", "/api/users/{user_id}", "/api/users/1", 0),
+    ("GET", "/api/assets/", "/api/assets/", 0),
+    ("GET", "/api/assets/{asset_id}", "/api/assets/1", 0),
+    ("POST", "/api/assets/", "/api/assets/", 0),
+    ("PUT", "/api/assets/{asset_id}", "/api/assets/1", 0),
+    ("DELETE", "/api/assets/{asset_id}", "/api/assets/1", 0),
+    ("GET", "/api/risks/", "/api/risks/", 0),
+    ("GET", "/api/risks/{risk_id}", "/api/risks/1", 0),
+    ("POST", "/api/risks/", "/api/risks/", 0),
+    ("PUT", "/api/risks/{risk_id}", "/api/risks/1", 0),
+    ("DELETE", "/api/risks/{risk_id}", "/api/risks/1", 0),
+    ("GET", "/api/policies/", "/api/policies/", 0),
+    ("GET", "/api/policies/{policy_id}", "/api/policies/1", 0),
+    ("POST", "/api/policies/", "/api/policies/", 0),
+    ("PUT", "/api/policies/{policy_id}", "/api/policies/1", 0),
+    ("DELETE", "/api/policies/{policy_id}", "/api/policies/1", 0),
+    ("GET", "/api/policies/{policy_id}/versions", "/api/policies/1/versions", 1),
+    ("GET", "/api/policies/{policy_id}/versions/diff",
+     "/api/policies/1/versions/diff?from_revision=1&to_revision=3", 1),
+    ("GET", "/api/policies/{policy_id}/versions/{revision_number}", "/api/policies/1/versions/3", 2),
+    ("GET", "/api/incidents/", "/api/incidents/", 0),
+    ("GET", "/api/incidents/{incident_id}", "/api/incidents/1", 0),
+    ("POST", "/api/incidents/", "/api/incidents/", 0),
+    ("PUT", "/api/incidents/{incident_id}", "/api/incidents/1", 0),
+    ("DELETE", "/api/incidents/{incident_id}", "/api/incidents/1", 0),
+]
+
+@pytest.fixture
+def seeded_db(db_session):
+    """Populate the database with a small register covering every router."""
+    db_session.add(Role(role_id=1, role_name="Administrator"))
+    db_session.add(User(user_id=1, username="admin", password_hash="x", email="admin@example.com", role_id=1))
+    db_session.add_all([
+        Asset(asset_id=1, asset_name="Production Server", asset_type=AssetTypeEnum.HARDWARE, owner_id=1),
+        Asset(asset_id=2, asset_name="Customer Database", asset_type=AssetTypeEnum.DATA, owner_id=1),
+    ])
+    policy = Policy(policy_id=1, policy_title="Access Control", policy_content="Rule 1.\n", version="1.2")
+    risk = Risk(risk_id=1, risk_description="Data breach", severity=5, likelihood=3, asset_id=2)
+    risk.policies.append(policy)
+    db_session.add_all([policy, risk])
+    db_session.add(Incident(incident_id=1, incident_description="Phishing email", severity=IncidentSeverityEnum.HIGH, asset_id=1))
+    for number, content in enumerate(["Rule 1.\n", "Rule 1.\nRule 2.\n", "Rule 1.\nRule 2 (revised).\n"]):
+        policy_history.record_revision(db_session, 1, f"1.{number}", content)
+    db_session.commit()
+    return db_session
+
+def test_every_route_has_a_budget():
+    """Test that every API route declares a query budget."""
+    routes = {
+        (method.upper(), path)
+        for path, operations in app.openapi()["paths"].items() if path.startswith("/api/")
+        for method in operations
+    }
+    assert routes == {(method, template) for method, template, _, _ in ROUTE_BUDGETS}
+
+@pytest.mark.parametrize("method,template,path,budget", ROUTE_BUDGETS, ids=[f"{m} {t}" for m, t, _, _ in ROUTE_BUDGETS])
+def test_route_query_budget(seeded_db, api_client, query_budget, method, template, path, budget):
+    """Test that each route stays within its query budget without duplicate statements."""
+    with query_budget(budget):
+        response = api_client.request(method, path)
+    assert response.status_code == 200
+
+def test_query_budget_catches_n_plus_one(seeded_db, query_budget):
+    """Test that lazily loading a relationship per row is reported."""
+    with pytest.raises(AssertionError, match="Duplicate queries"):
+        with query_budget(10):
+            for asset in seeded_db.query(Asset).all():
+                seeded_db.expire(asset)
+                _ = asset.owner.username
+
+def test_query_budget_catches_excess_queries(seeded_db, query_budget):
+    """Test that exceeding the budget is reported."""
+    with pytest.raises(AssertionError, match="at most 1 queries"):
+        with query_budget(1):
+            seeded_db.query(Asset).all()
+            seeded_db.query(Risk).all()
@@ -0,0 +1,158 @@
+"""
+Tests for the in-memory risk register snapshot.
+
+This module contains tests for loading, incrementally refreshing and
+querying the columnar risk register.
+"""
+
+import asyncio
+import json
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from models import Base, Role, User, Asset, Risk, Policy, AssetTypeEnum, RiskStatusEnum
+from services.risk_register import RiskRegisterCache
+
+@pytest.fixture
+def db():
+    """Create an in-memory database with two assets, two risks and a policy."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Role(role_id=1, role_name="Administrator"))
+    session.add(User(user_id=1, username="admin", password_hash="x", email="admin@example.com", role_id=1))
+    session.add_all([
+        Asset(asset_id=1, asset_name="Customer Database", asset_type=AssetTypeEnum.DATA, owner_id=1),
+        Asset(asset_id=2, asset_name="Corporate Network", asset_type=AssetTypeEnum.NETWORK, owner_id=1),
+    ])
+    policy = Policy(policy_id=1, policy_title="Access Control", policy_content="...", version="1.0")
+    risk = Risk(risk_id=1, risk_description="Data breach", severity=5, likelihood=4, asset_id=1)
+    risk.policies.append(policy)
+    session.add_all([risk, Risk(risk_id=2, risk_description="DDoS", severity=3, likelihood=2, asset_id=2)])
+    session.commit()
+    yield session
+    session.close()
+
+@pytest.fixture
+def cache(db):
+    """Create a risk register cache loaded from the database."""
+    cache = RiskRegisterCache()
+    cache.refresh(db)
+    return cache
+
+def test_snapshot_queries(cache):
+    """Test filtering, grouping and ranking over the snapshot."""
+    snapshot = cache.snapshot
+    assert len(snapshot) == 2
+    assert snapshot.filter(asset_type=AssetTypeEnum.NETWORK).tolist() == [2]
+    assert snapshot.filter(min_score=10).tolist() == [1]
+    assert snapshot.filter(uncovered=True).tolist() == [2]
+    assert snapshot.count_by("asset_type")[AssetTypeEnum.DATA] == 1
+    assert snapshot.count_by("severity") == {3: 1, 5: 1}
+    assert snapshot.heatmap()[4, 3] == 1
+    assert snapshot.top_risks(1) == [1]
+
+def test_top_risks_ignores_unknown_ids(cache):
+    """Test that ranking a subset skips IDs missing from the snapshot."""
+    snapshot = cache.snapshot
+    assert snapshot.top_risks(5, risk_ids=[2, 7, 99]) == [2]
+    assert snapshot.top_risks(5, risk_ids=[0, 99]) == []
+    assert snapshot.top_risks(5, risk_ids=[2, 1, 2]) == [1, 2]
+
+def test_policy_links(cache):
+    """Test risk-to-policy adjacency in both directions."""
+    snapshot = cache.snapshot
+    assert snapshot.policies_for_risk(1).tolist() == [1]
+    assert snapshot.policies_for_risk(2).tolist() == []
+    assert snapshot.risks_for_policy(1).tolist() == [1]
+    assert snapshot.risks_for_policy(99).tolist() == []
+
+def test_refresh_picks_up_new_rows(db, cache):
+    """Test that rows added since the last refresh are loaded."""
+    db.add(Risk(risk_id=3, risk_description="Insider threat", severity=4, likelihood=4, asset_id=1))
+    db.commit()
+    previous = cache.snapshot
+    snapshot = cache.refresh(db)
+    assert snapshot.risk_ids.tolist() == [1, 2, 3]
+    assert snapshot.top_risks(2) == [1, 3]
+    assert len(previous) == 2
+
+def test_refresh_applies_changed_rows(db, cache):
+    """Test that updates, new links and deletes are applied without a full refresh."""
+    risk = db.get(Risk, 2)
+    risk.status = RiskStatusEnum.MITIGATED
+    risk.policies.append(db.get(Policy, 1))
+    db.delete(db.get(Risk, 1))
+    db.commit()
+
+    snapshot = cache.refresh(db)
+    assert snapshot.risk_ids.tolist() == [2]
+    assert snapshot.count_by("status")[RiskStatusEnum.MITIGATED] == 1
+    assert snapshot.risks_for_policy(1).tolist() == [2]
+
+def test_refresh_applies_removed_links(db, cache):
+    """Test that unlinking or deleting a policy is picked up by an incremental refresh."""
+    policy = Policy(policy_id=2, policy_title="Backup", policy_content="...", version="1.0")
+    risk = db.get(Risk, 2)
+    risk.policies.append(policy)
+    db.commit()
+    assert cache.refresh(db).risks_for_policy(2).tolist() == [2]
+
+    risk = db.get(Risk, 1)
+    risk.policies.remove(db.get(Policy, 1))
+    db.delete(policy)
+    db.commit()
+    snapshot = cache.refresh(db)
+    assert snapshot.risks_for_policy(1).tolist() == []
+    assert snapshot.risks_for_policy(2).tolist() == []
+
+def test_link_changes_stamp_risks(db):
+    """Test that linking, unlinking and deleting policies moves updated_at on the affected risks."""
+    backdated = datetime(2020, 1, 1)
+    db.execute(update(Risk.__table__).values(updated_at=backdated))
+    db.commit()
+    policy = db.get(Policy, 1)
+    risk = db.get(Risk, 2)
+    policy.risks.append(risk)
+    db.commit()
+    assert db.get(Risk, 2).updated_at > backdated
+    assert db.get(Risk, 1).updated_at == backdated
+
+    db.execute(update(Risk.__table__).values(updated_at=backdated))
+    db.commit()
+    db.delete(policy)
+    db.commit()
+    assert all(risk.updated_at > backdated for risk in db.query(Risk))
+
+def test_refresh_applies_changed_assets(db, cache):
+    """Test that asset changes are reflected on their risks."""
+    db.get(Asset, 2).asset_type = AssetTypeEnum.HARDWARE
+    db.commit()
+    assert cache.refresh(db).filter(asset_type=AssetTypeEnum.HARDWARE).tolist() == [2]
+
+def test_marked_and_full_refresh_apply_untimestamped_changes(db, cache):
+    """Test that rows changed without touching updated_at are reloaded when marked or on a full refresh."""
+    db.execute(update(Risk.__table__).where(Risk.risk_id == 2).values(severity=5, updated_at=datetime(2020, 1, 1)))
+    db.commit()
+    assert cache.refresh(db).risk(2)["severity"] == 3
+    cache.mark_changed("risk", 2)
+    assert cache.refresh(db).risk(2)["severity"] == 5
+
+    db.execute(update(Risk.__table__).where(Risk.risk_id == 1).values(severity=1, updated_at=datetime(2020, 1, 1)))
+    db.commit()
+    assert cache.refresh(db, full=True).risk(1)["severity"] == 1
+
+def test_mcp_risk_register_consumers(monkeypatch, cache):
+    """Test that the MCP risk summary resource and top risks tool read the snapshot."""
+    from services import mcp_service
+    monkeypatch.setattr(mcp_service, "risk_register", cache)
+
+    summary = json.loads(mcp_service.get_risk_register_summary())
+    assert summary["total_risks"] == 2
+    assert summary["by_status"]["Identified"] == 2
+    assert summary["uncovered_risks"] == 1
+
+    risks = json.loads(asyncio.run(mcp_service.list_top_risks(count=5, uncovered_only=True)))
+    assert risks == [{"risk_id": 2, "asset_id": 2, "asset_type": "Network", "severity": 3,
+                      "likelihood": 2, "status": "Identified", "policy_ids": []}]
@@ -0,0 +1,66 @@
+"""
+Tests for application startup cost.
+
+This module checks that importing the application stays within its
+import-time budget and does not load heavy optional libraries.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+import database
+from services import cache_bus
+from main import app
+
+# Seconds allowed for a cold `import main`, with headroom for loaded CI runners; overridable for slow machines
+IMPORT_TIME_BUDGET = float(os.getenv("IMPORT_TIME_BUDGET", "1.5"))
+
+# Libraries that must only be imported when first used
+DEFERRED_MODULES = ["mcp", "qdrant_client", "mistralai", "numpy", "psycopg2"]
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEASURE_IMPORT = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+import database
+from services import cache_bus
+print(json.dumps({
+    "elapsed": elapsed,
+    "loaded": [name for name in %r if name in sys.modules],
+    "engine_created": database._engine is not None,
+}))
+""" % (DEFERRED_MODULES,)
+
+def _measure_import():
+    """Import the application in a fresh interpreter and report what it cost."""
+    output = subprocess.run(
+        [sys.executable, "-c", MEASURE_IMPORT],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_import_is_lazy():
+    """Test that importing the application defers heavy libraries and the engine."""
+    result = _measure_import()
+    assert result["loaded"] == []
+    assert result["engine_created"] is False
+
+def test_import_time_budget():
+    """Test that a cold import of the application stays within budget."""
+    elapsed = min(_measure_import()["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_TIME_BUDGET, f"import main took {elapsed:.3f}s (budget {IMPORT_TIME_BUDGET}s)"
+
+def test_lifespan_creates_and_disposes_engine(monkeypatch):
+    """Test that the engine is created on startup and released on shutdown."""
+    monkeypatch.setenv("CACHE_INVALIDATION_BUS", "local")
+    monkeypatch.setattr(cache_bus, "_bus", None)
+    database.dispose_engine()
+    with TestClient(app) as client:
+        assert database._engine is not None
+        assert client.get("/").status_code == 200
+    assert database._engine is None